@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+from telegram.warnings import PTBUserWarning
+
+# Benchmark pentru fluxul de comandă: construiește aplicația cu un Bot API simulat
+# (fake_api.FakeBotAPI), rulează sesiuni complete pentru mulți utilizatori în paralel
+# și raportează latența pe handler, interogările la baza de date și memoria pe utilizator.
+#
+#   python benchmark.py --users 2000 --concurrency 500
+#   python benchmark.py --users 500 --fail-p95-ms 50   # cod de ieșire 1 la regresie
+
+SESSION = [
+    ("start", "message", "/start"),
+    ("products", "callback", "products"),
+    ("category", "callback", "category_{category}"),
+    ("product", "callback", "product_{product_id}"),
+    ("add_to_cart", "callback", "add_to_cart_{product_id}"),
+    ("cart", "callback", "cart"),
+    ("checkout", "callback", "checkout"),
+    ("name", "message", "Ion Popescu"),
+    ("phone", "message", "0722123456"),
+    ("address", "message", "Str. Exemplu 1"),
+    ("skip", "message", "/skip"),
+    ("confirm_order", "callback", "confirm_order"),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark pentru fluxul de comandă al botului")
+    parser.add_argument("--users", type=int, default=1000, help="numărul de utilizatori simulați")
+    parser.add_argument("--concurrency", type=int, default=200, help="câți utilizatori sunt activi simultan")
+    parser.add_argument("--workers", type=int, default=16, help="CONCURRENT_WORKERS pentru aplicație")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="latența simulată a Bot API (secunde)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pauza între pașii unui utilizator (secunde)")
+    parser.add_argument("--memory-users", type=int, default=200, help="utilizatori pentru măsurarea memoriei (0 = fără)")
+    parser.add_argument("--db", default="cosmetics.db", help="baza de date copiată pentru benchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="raport în format JSON")
+    parser.add_argument("--fail-p95-ms", type=float, default=0.0, help="eșuează dacă p95 depășește pragul")
+    return parser.parse_args()
+
+
+# Configurarea trebuie făcută înainte de importul lui bot.py (care citește mediul la import)
+def prepare_environment(args, workdir: str):
+    db_path = os.path.join(workdir, "cosmetics.db")
+    shutil.copy(args.db, db_path)
+    # Stoc suficient pentru toate comenzile simulate
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE products SET stock = 1000000")
+    conn.close()
+    os.environ.update({
+        "DB_PATH": db_path,
+        "STATE_DB_PATH": os.path.join(workdir, "user_state.db"),
+        "ADMIN_CHAT_ID": "1",
+        "CONCURRENT_WORKERS": str(args.workers),
+        "UPDATE_QUEUE_SIZE": str(max(1000, args.concurrency * 2)),
+        "QUEUE_STATS_INTERVAL": "0",
+        "PERSISTENCE_COMPACT_INTERVAL": "0",
+        "RATE_LIMIT_GLOBAL": "1000000",
+        "RATE_LIMIT_CHAT": "1000000",
+        "RATE_LIMIT_CHAT_BURST": "1000000",
+    })
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Simulator:
+    def __init__(self, application, products: list, think_time: float):
+        self.application = application
+        self.products = products
+        self.think_time = think_time
+        self.latencies = {}
+        self._ids = itertools.count(1)
+        self._pending = {}
+
+    # Rulează după ConversationHandler (grup mai mare) și marchează update-ul ca procesat
+    async def mark_done(self, update, context):
+        future = self._pending.pop(update.update_id, None)
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+
+    def _update(self, user_id: int, kind: str, payload: str) -> dict:
+        update_id = next(self._ids)
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        if kind == "message":
+            message = {"message_id": update_id, "date": int(time.time()), "chat": chat, "from": user, "text": payload}
+            if payload.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(payload.split()[0])}]
+            return {"update_id": update_id, "message": message}
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": user,
+                "chat_instance": str(user_id),
+                "data": payload,
+                "message": {"message_id": update_id, "date": int(time.time()), "chat": chat, "text": "meniu"},
+            },
+        }
+
+    async def session(self, user_id: int, rng: random.Random):
+        from telegram import Update
+
+        product = rng.choice(self.products)
+        values = {"category": product["category"], "product_id": product["id"]}
+        for step, kind, template in SESSION:
+            data = self._update(user_id, kind, template.format(**values))
+            update = Update.de_json(data, self.application.bot)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[update.update_id] = future
+            started = time.perf_counter()
+            await self.application.update_queue.put(update)
+            finished = await future
+            self.latencies.setdefault(step, []).append(finished - started)
+            if self.think_time:
+                await asyncio.sleep(self.think_time)
+
+
+async def run_sessions(simulator: Simulator, user_ids: range, concurrency: int, seed: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(user_id):
+        async with semaphore:
+            await simulator.session(user_id, random.Random(seed + user_id))
+
+    await asyncio.gather(*(limited(user_id) for user_id in user_ids))
+
+
+async def benchmark(args) -> dict:
+    import bot
+    from fake_api import FakeBotAPI
+    from telegram.ext import TypeHandler
+    from telegram import Update
+
+    fake_api = FakeBotAPI(latency=args.api_latency)
+    application = bot.build_application("123456:BENCHMARK", request=fake_api)
+
+    await bot.refresh_catalog()
+    products = [
+        {"id": product["id"], "category": category}
+        for category in bot.catalog.categories()
+        for product in bot.catalog.products_by_category(category)
+    ]
+    simulator = Simulator(application, products, args.think_time)
+    application.add_handler(TypeHandler(Update, simulator.mark_done), group=99)
+
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+
+    orders_before = (await bot.db.fetchone("SELECT COUNT(*) AS n FROM orders"))["n"]
+    db_before = bot.db.round_trips + application.persistence.db.round_trips
+    api_before = len(fake_api.calls)
+    bad_before = fake_api.bad_requests
+    started = time.perf_counter()
+    await run_sessions(simulator, range(1, args.users + 1), args.concurrency, args.seed)
+    duration = time.perf_counter() - started
+    db_round_trips = bot.db.round_trips + application.persistence.db.round_trips - db_before
+    api_calls = len(fake_api.calls) - api_before
+    bad_requests = fake_api.bad_requests - bad_before
+    latencies = {step: list(values) for step, values in simulator.latencies.items()}
+    # Verificare: fiecare sesiune trebuie să se încheie cu o comandă plasată
+    orders = (await bot.db.fetchone("SELECT COUNT(*) AS n FROM orders"))["n"] - orders_before
+
+    memory_per_user = None
+    if args.memory_users:
+        # Memoria reținută pe utilizator (user_data, starea conversației, cozi), măsurată separat
+        # pentru că tracemalloc încetinește procesarea
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        first_id = args.users + 1
+        await run_sessions(simulator, range(first_id, first_id + args.memory_users), args.concurrency, args.seed)
+        gc.collect()
+        retained = tracemalloc.take_snapshot().compare_to(baseline, "filename")
+        tracemalloc.stop()
+        memory_per_user = sum(stat.size_diff for stat in retained) / args.memory_users
+
+    await application.stop()
+    await application.post_stop(application)
+    await application.shutdown()
+    await application.post_shutdown(application)
+
+    updates = sum(len(values) for values in latencies.values())
+    all_latencies = [value for values in latencies.values() for value in values]
+    to_ms = lambda value: round(value * 1000, 3)
+    return {
+        "users": args.users,
+        "orders": orders,
+        "updates": updates,
+        "duration_s": round(duration, 3),
+        "updates_per_s": round(updates / duration, 1) if duration else 0.0,
+        "latency_ms": {
+            "p50": to_ms(percentile(all_latencies, 50)),
+            "p95": to_ms(percentile(all_latencies, 95)),
+            "p99": to_ms(percentile(all_latencies, 99)),
+        },
+        "handlers": {
+            step: {
+                "p50": to_ms(percentile(latencies.get(step, []), 50)),
+                "p95": to_ms(percentile(latencies.get(step, []), 95)),
+                "p99": to_ms(percentile(latencies.get(step, []), 99)),
+            }
+            for step, _, _ in SESSION
+        },
+        "db_round_trips_per_update": round(db_round_trips / updates, 3) if updates else 0.0,
+        "api_calls_per_update": round(api_calls / updates, 3) if updates else 0.0,
+        "api_bad_requests": bad_requests,
+        "memory_per_user_bytes": round(memory_per_user) if memory_per_user is not None else None,
+    }
+
+
+def print_report(report: dict):
+    print(f"Utilizatori: {report['users']}, comenzi: {report['orders']}, update-uri: {report['updates']}, durată: {report['duration_s']}s")
+    print(f"Debit: {report['updates_per_s']} update-uri/s")
+    latency = report["latency_ms"]
+    print(f"Latență (ms): p50={latency['p50']} p95={latency['p95']} p99={latency['p99']}")
+    print(f"{'pas':<16}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for step, values in report["handlers"].items():
+        print(f"{step:<16}{values['p50']:>10}{values['p95']:>10}{values['p99']:>10}")
+    print(f"Interogări DB pe update: {report['db_round_trips_per_update']}")
+    print(f"Apeluri Bot API pe update: {report['api_calls_per_update']}")
+    if report["api_bad_requests"]:
+        print(f"Apeluri respinse de Bot API (400): {report['api_bad_requests']}")
+    if report["memory_per_user_bytes"] is not None:
+        print(f"Memorie pe utilizator: {report['memory_per_user_bytes']} octeți")
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    warnings.filterwarnings("ignore", category=PTBUserWarning)
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_environment(args, workdir)
+        report = asyncio.run(benchmark(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if report["orders"] < report["users"]:
+        print(f"Doar {report['orders']} din {report['users']} sesiuni au plasat comanda", file=sys.stderr)
+        sys.exit(1)
+    if args.fail_p95_ms and report["latency_ms"]["p95"] > args.fail_p95_ms:
+        print(f"p95 {report['latency_ms']['p95']}ms depășește pragul de {args.fail_p95_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
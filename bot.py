@@ -1,25 +1,58 @@
+import time
+
+# Momentul pornirii, măsurat înaintea importurilor grele (telegram, httpx)
+STARTED_AT = time.perf_counter()
+
+import asyncio
 import logging
 import json
 import uuid
-import sqlite3
 from datetime import datetime
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import InlineQueryResultsButton, Update
 from telegram.ext import (
     Application,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
     ConversationHandler,
+    InlineQueryHandler,
+    TypeHandler,
     filters,
     ContextTypes,
 )
 from dotenv import load_dotenv
 import os
+import signal
+
+from cart import format_cart_lines, normalize_cart, price_cart
+from catalog import CatalogCache, search_products
+from cluster import run_cluster
+from concurrency import OrderedApplication, log_queue_stats
+from database import Database
+from fake_api import FakeBotAPI
+from inline import InlineSearch
+from keyboards import AFTER_ADD_TO_CART, BACK_TO_MENU, CART, CONFIRM_ORDER_KEYBOARD, MAIN_MENU, KeyboardCache
+from metrics import Metrics, instrument_conversation, start_metrics_server, timed_callback
+from navigation import Navigator
+from orders import OrderPipeline, OutOfStockError, format_admin_message, place_order
+from photos import PhotoCache
+from ratelimit import PRIORITY_HIGH, OutboundRateLimiter
+from recommendations import Recommender
+from persistence import SQLitePersistence, compact_periodically
+from schema import ensure_schema
+from startup import StartupTimer
+from webhook import WebhookServer, run_webhook
+
+# Variabilele din .env sunt necesare deja la import (calea bazei de date, cache)
+load_dotenv()
 
 # Configurare logging
 logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fazele pornirii și timpul până la primul update procesat
+startup = StartupTimer(STARTED_AT)
+
 # Stări pentru ConversationHandler
 (
     CHOOSE_CATEGORY,
@@ -33,91 +66,114 @@ logger = logging.getLogger(__name__)
     CONFIRM_ORDER,
 ) = range(9)
 
-# Simulăm o bază de date sqlite3 cu produse
-# Conexiune la baza de date SQLite
-def get_db_connection():
-    conn = sqlite3.connect("cosmetics.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+DB_PATH = os.getenv("DB_PATH", "cosmetics.db")
+
+# Indexul procesului în modul cu mai multe procese (cluster.py); sarcinile care trebuie
+# să ruleze o singură dată (reluarea comenzilor, compactarea, preîncărcarea pozelor) rulează doar în procesul 0
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+
+# Acces asincron la baza de date (pool de thread-uri, mod WAL) folosit din handler-e
+db = Database(DB_PATH, pool_size=int(os.getenv("DB_POOL_SIZE", "4")))
+
+# Cache-ul catalogului: categoriile și produsele sunt servite din memorie
+# și reîncărcate doar când cosmetics.db se schimbă
+catalog = CatalogCache(DB_PATH, check_interval=float(os.getenv("CATALOG_CHECK_INTERVAL", "1.0")))
+
+# Tastaturile pentru categorii și produse, refolosite până la următoarea reîncărcare a catalogului
+keyboard_cache = KeyboardCache(catalog, page_size=int(os.getenv("CATEGORY_PAGE_SIZE", "8")))
+
+SEARCH_RESULTS_LIMIT = int(os.getenv("SEARCH_RESULTS_LIMIT", "10"))
+
+# Comenzile sunt salvate în cosmetics.db, iar adminul e notificat în fundal
+order_pipeline = OrderPipeline(db, rate_limit_args={"priority": PRIORITY_HIGH})
+
+# Best-sellers și „cumpărate împreună”, recalculate periodic din comenzile confirmate
+recommender = Recommender(db)
+
+# Căutarea inline (@bot text), cu rezultatele interogărilor recente păstrate în memorie
+inline_search = InlineSearch(
+    catalog, db, recommender,
+    limit=int(os.getenv("INLINE_RESULTS_LIMIT", "20")),
+    cache_size=int(os.getenv("INLINE_CACHE_SIZE", "1024")),
+)
+# Cât timp (secunde) păstrează Telegram rezultatele unei interogări inline
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+
+# file_id-urile Telegram ale pozelor, ca pozele să nu fie descărcate din nou de la URL
+photo_cache = PhotoCache(db)
+
+# Metricile (durata handler-elor, a interogărilor și a apelurilor Bot API) sunt colectate
+# doar cu METRICS_ENABLED=1; altfel nimic nu este instrumentat
+metrics = Metrics() if os.getenv("METRICS_ENABLED", "0") == "1" else None
+if metrics:
+    db.metrics = metrics
+    metrics.add_collector("catalog", catalog.stats)
+    metrics.add_collector("keyboards", keyboard_cache.stats)
+    metrics.add_collector("photos", photo_cache.stats)
+    metrics.add_collector("inline", inline_search.stats)
+    metrics.add_collector("startup", startup.stats)
+
+# NAV_MODE=edit: navigarea editează mesajul pe care s-a apăsat în loc să trimită unul nou
+navigator = Navigator(photo_cache, edit=os.getenv("NAV_MODE", "reply") == "edit")
+if metrics:
+    metrics.add_collector("navigation", navigator.stats)
+
+# Verificarea schimbărilor din catalog rulează în pool-ul bazei de date, nu în bucla de evenimente
+async def refresh_catalog():
+    if catalog.due():
+        await db.run_sync(catalog.refresh)
+
+# import_catalog.py --notify-pid trimite SIGUSR1 după import: catalogul se reîncarcă imediat,
+# fără să aștepte următoarea verificare
+catalog_reloads = set()
+
+def reload_catalog():
+    logger.info("Reîncărcarea catalogului a fost cerută (SIGUSR1)")
+    task = asyncio.create_task(db.run_sync(catalog.invalidate))
+    catalog_reloads.add(task)
+    task.add_done_callback(catalog_reloads.discard)
 
 # Obține lista de categorii distincte
-def get_categories():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM categories")
-    categories = [row["name"] for row in cur.fetchall()]
-    conn.close()
-    return categories
+async def get_categories():
+    await refresh_catalog()
+    return catalog.categories()
 
 # Obține toate produsele dintr-o categorie
-def get_products_by_category(category_name):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT p.* FROM products p
-        JOIN categories c ON p.category_id = c.id
-        WHERE c.name = ?
-    """, (category_name,))
-    products = [dict(row) for row in cur.fetchall()]
-    conn.close()
-    return products
+async def get_products_by_category(category_name):
+    await refresh_catalog()
+    return catalog.products_by_category(category_name)
 
 # Obține un produs după ID
-def get_product_by_id(product_id: int) -> dict:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    row = cur.fetchone()
-    conn.close()
-    return dict(row) if row else None
-
-# Exemplu pentru best-sellers: primele id-uri din fiecare categorie
-def get_best_sellers():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT MIN(p.id) as id
-        FROM products p
-        JOIN categories c ON p.category_id = c.id
-        GROUP BY p.category_id
-    """)
-    best_sellers = [row["id"] for row in cur.fetchall()]
-    conn.close()
-    return best_sellers
-
-# Simulăm best-sellers
-BEST_SELLERS = get_best_sellers()
+async def get_product_by_id(product_id: int) -> dict:
+    await refresh_catalog()
+    return catalog.product(product_id)
+
+# Prețul întregului coș, rezolvat dintr-o singură trecere (cache sau o singură interogare)
+async def get_priced_cart(cart: dict) -> dict:
+    await refresh_catalog()
+    return await price_cart(cart, catalog, db)
 
 # Coșul de cumpărături (stocat în context.user_data)
 def get_cart(context) -> dict:
-    return context.user_data.get("cart", {})
+    return normalize_cart(context.user_data.get("cart", {}))
 
 def save_cart(context, cart: dict):
     context.user_data["cart"] = cart
 
 
+MAX_CAPTION_LENGTH = 1024
+
 def format_product(product: dict) -> str:
     return f"**{product['name']}**\nPreț: {product['price']} RON\nDescriere: {product['description']}\nStoc: {product['stock']} buc."
 
+WELCOME_TEXT = "Bună! Bine ai venit la magazinul nostru de cosmetice! 💄\nCe dorești să faci astăzi?"
+
 # Meniul principal
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [InlineKeyboardButton("🛍️ Produse", callback_data="products")],
-        [InlineKeyboardButton("🔥 Promoții", callback_data="promotions")],
-        [InlineKeyboardButton("📞 Contact", callback_data="contact")],
-        [InlineKeyboardButton("🛒 Coșul meu", callback_data="cart")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
     if update.callback_query:
-        await update.callback_query.message.reply_text(
-            "Bună! Bine ai venit la magazinul nostru de cosmetice! 💄\nCe dorești să faci astăzi?",
-            reply_markup=reply_markup,
-        )
+        await navigator.show_text(update.callback_query, WELCOME_TEXT, MAIN_MENU)
     else:
-        await update.message.reply_text(
-            "Bună! Bine ai venit la magazinul nostru de cosmetice! 💄\nCe dorești să faci astăzi?",
-            reply_markup=reply_markup,
-        )
+        await update.message.reply_text(WELCOME_TEXT, reply_markup=MAIN_MENU)
     return CHOOSE_CATEGORY
 
 # Gestionarea butoanelor din meniu
@@ -126,50 +182,28 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     if query.data == "products":
-        categories = get_categories()
-        keyboard = [
-            [InlineKeyboardButton(category.title(), callback_data=f"category_{category}")]
-            for category in categories
-        ]
-        keyboard.append([InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.message.reply_text("Alege o categorie:", reply_markup=reply_markup)
+        await refresh_catalog()
+        await navigator.show_text(query, "Alege o categorie:", keyboard_cache.categories())
         return CHOOSE_CATEGORY
 
     elif query.data == "promotions":
-        keyboard = [[InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.message.reply_text("🔥 **Promoții speciale**:\nMomentan nu avem promoții active. Verifică mai târziu!", reply_markup=reply_markup)
+        await navigator.show_text(query, "🔥 **Promoții speciale**:\nMomentan nu avem promoții active. Verifică mai târziu!", BACK_TO_MENU)
         return CHOOSE_CATEGORY
 
     elif query.data == "contact":
-        keyboard = [[InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.message.reply_text("📞 **Contact**:\nEmail: contact@magazin-cosmetice.ro\nTelefon: 0722 123 456", reply_markup=reply_markup)
+        await navigator.show_text(query, "📞 **Contact**:\nEmail: contact@magazin-cosmetice.ro\nTelefon: 0722 123 456", BACK_TO_MENU)
         return CHOOSE_CATEGORY
 
     elif query.data == "cart":
         cart = get_cart(context)
-        keyboard = [[InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
         if not cart:
-            await query.message.reply_text("Coșul tău este gol! 🛒", reply_markup=reply_markup)
+            await navigator.show_text(query, "Coșul tău este gol! 🛒", BACK_TO_MENU)
         else:
-            total = 0
+            priced = await get_priced_cart(cart)
             response = "🛒 **Coșul tău**:\n"
-            for product_id, quantity in cart.items():
-                product = get_product_by_id(product_id)
-                if product:
-                    subtotal = product["price"] * quantity
-                    total += subtotal
-                    response += f"{product['name']} x{quantity}: {subtotal} RON\n"
-            response += f"\n**Total**: {total} RON"
-            keyboard = [
-                [InlineKeyboardButton("Finalizează comanda", callback_data="checkout")],
-                [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.message.reply_text(response, reply_markup=reply_markup)
+            response += format_cart_lines(priced)
+            response += f"\n**Total**: {priced['total']} RON"
+            await navigator.show_text(query, response, CART)
         return CHOOSE_CATEGORY
 
     elif query.data == "back_to_menu":
@@ -178,6 +212,67 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     return CHOOSE_CATEGORY
 
+# Lista de produse a unei categorii, paginată (aceeași tastatură pentru toate căile de navigare)
+async def show_category_products(query, context, category: str, page: int = 0):
+    _, pages = catalog.products_page(category, page, keyboard_cache.page_size)
+    page = max(0, min(page, pages - 1))
+    context.user_data["current_page"] = page
+    text = f"Produse din categoria **{category.title()}**:"
+    if pages > 1:
+        text += f" (pagina {page + 1}/{pages})"
+    await navigator.show_text(query, text, keyboard_cache.category_products(category, page))
+
+# Navigarea între paginile unei categorii
+async def change_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    _, page, category = query.data.split("_", 2)
+    await refresh_catalog()
+    if not catalog.has_category(category):
+        return CHOOSE_CATEGORY
+    context.user_data["current_category"] = category
+    await show_category_products(query, context, category, int(page))
+    return CHOOSE_PRODUCT
+
+# „Înapoi la categorie”: categoria produsului afișat ultima dată; dacă ea nu mai există,
+# lista categoriilor
+async def back_to_products(query, context):
+    category = context.user_data.get("current_category", "")
+    await refresh_catalog()
+    if catalog.has_category(category):
+        await show_category_products(query, context, category, context.user_data.get("current_page", 0))
+        return CHOOSE_PRODUCT
+    await navigator.show_text(query, "Alege o categorie:", keyboard_cache.categories())
+    return CHOOSE_CATEGORY
+
+# Căutare full-text după nume și descriere: /search <text>
+async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = " ".join(context.args or [])
+    if not text:
+        await update.message.reply_text("Scrie /search urmat de ce cauți, de exemplu: /search ser", reply_markup=BACK_TO_MENU)
+        return CHOOSE_CATEGORY
+    await refresh_catalog()
+    product_ids = await db.run(search_products, text, SEARCH_RESULTS_LIMIT)
+    if not product_ids:
+        await update.message.reply_text(f"Nu am găsit produse pentru „{text}”.", reply_markup=BACK_TO_MENU)
+        return CHOOSE_CATEGORY
+    await update.message.reply_text(
+        f"Rezultate pentru „{text}”:",
+        reply_markup=keyboard_cache.search_results(product_ids),
+    )
+    return CHOOSE_PRODUCT
+
+# Căutare inline: @bot text în orice chat; rezultatele sunt aceleași pentru toți utilizatorii
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await refresh_catalog()
+    results = await inline_search.results(update.inline_query.query)
+    await update.inline_query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+        button=InlineQueryResultsButton(text="Deschide magazinul", start_parameter="inline"),
+    )
+
 # Afișarea produselor dintr-o categorie
 async def choose_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -186,18 +281,10 @@ async def choose_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await start(update, context)
         return CHOOSE_CATEGORY
     category = query.data.replace("category_", "")
-    categories = get_categories()
-    if category in categories:
+    await refresh_catalog()
+    if catalog.has_category(category):
         context.user_data["current_category"] = category
-        products = get_products_by_category(category)
-        keyboard = [
-            [InlineKeyboardButton(product["name"], callback_data=f"product_{product['id']}")]
-            for product in products
-        ]
-        keyboard.append([InlineKeyboardButton("Înapoi la categorii", callback_data="back_to_products")])
-        keyboard.append([InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.message.reply_text(f"Produse din categoria **{category.title()}**:", reply_markup=reply_markup)
+        await show_category_products(query, context, category)
         return CHOOSE_PRODUCT
     return CHOOSE_CATEGORY
 
@@ -206,46 +293,36 @@ async def product_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     if query.data == "back_to_products":
-        category = context.user_data.get("current_category", "")
-        products = get_products_by_category(category)
-        if products:
-            keyboard = [
-                [InlineKeyboardButton(product["name"], callback_data=f"product_{product['id']}")]
-                for product in products
-            ]
-            keyboard.append([InlineKeyboardButton("Înapoi la categorii", callback_data="back_to_products")])
-            keyboard.append([InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.message.reply_text(f"Produse din categoria **{category.title()}**:", reply_markup=reply_markup)
-            return CHOOSE_PRODUCT
-        return CHOOSE_CATEGORY
+        return await back_to_products(query, context)
     elif query.data == "back_to_menu":
         await start(update, context)
         return CHOOSE_CATEGORY
     product_id = int(query.data.replace("product_", ""))
-    product = get_product_by_id(product_id)
+    product = await get_product_by_id(product_id)
     if product:
-        await query.message.reply_photo(
-            photo=product["image"],
-            caption=format_product(product),
-            parse_mode="Markdown",
-        )
-        keyboard = [
-            [InlineKeyboardButton("Adaugă în coș", callback_data=f"add_to_cart_{product_id}")],
-            [InlineKeyboardButton("Înapoi la categorie", callback_data="back_to_products")],
-            [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        # Sugestii de produse asemănătoare sau best-sellers
-        suggestions = [p for p in BEST_SELLERS if p != product_id][:2]
+        # Produsul poate fi deschis și din căutare: „Înapoi la categorie” duce la categoria lui
+        category, page = catalog.product_location(product_id, keyboard_cache.page_size)
+        if category is not None:
+            context.user_data["current_category"] = category
+            context.user_data["current_page"] = page
+        reply_markup = keyboard_cache.product_actions(product_id)
+        # Sugestii: produse cumpărate des împreună cu acesta, apoi best-sellers (doar cele în stoc)
+        candidates = recommender.suggest(product_id)
+        available = catalog.products(candidates)
+        suggestions = [available[p] for p in candidates if p in available and available[p]["stock"] > 0][:2]
         if suggestions:
             suggestion_text = "\n\n**Îți recomandăm și:**\n"
-            for sug_id in suggestions:
-                sug_product = get_product_by_id(sug_id)
+            for sug_product in suggestions:
                 suggestion_text += f"- {sug_product['name']} ({sug_product['price']} RON)\n"
-            await query.message.reply_text(suggestion_text, reply_markup=reply_markup)
         else:
-            await query.message.reply_text("Ce mai dorești să faci?", reply_markup=reply_markup)
+            suggestion_text = "\n\nCe mai dorești să faci?"
+        caption = format_product(product)
+        # Poza, sugestiile și butoanele pleacă într-un singur mesaj când încap în descriere
+        if len(caption) + len(suggestion_text) <= MAX_CAPTION_LENGTH:
+            await navigator.show_photo(query, product, caption + suggestion_text, reply_markup, parse_mode="Markdown")
+        else:
+            await navigator.show_photo(query, product, caption, parse_mode="Markdown")
+            await query.message.reply_text(suggestion_text.strip(), reply_markup=reply_markup)
         return PRODUCT_DETAILS
     return CHOOSE_CATEGORY
 
@@ -254,38 +331,20 @@ async def add_to_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     if query.data == "back_to_products":
-        category = context.user_data.get("current_category", "")
-        products = get_products_by_category(category)  # <-- folosește baza de date
-        if products:
-            keyboard = [
-                [InlineKeyboardButton(product["name"], callback_data=f"product_{product['id']}")]
-                for product in products
-            ]
-            keyboard.append([InlineKeyboardButton("Înapoi la categorii", callback_data="back_to_products")])
-            keyboard.append([InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.message.reply_text(f"Produse din categoria **{category.title()}**:", reply_markup=reply_markup)
-            return CHOOSE_PRODUCT
-        return CHOOSE_CATEGORY
+        return await back_to_products(query, context)
     elif query.data == "back_to_menu":
         await start(update, context)
         return CHOOSE_CATEGORY
     product_id = int(query.data.replace("add_to_cart_", ""))
-    product = get_product_by_id(product_id)
+    product = await get_product_by_id(product_id)
     if product and product["stock"] > 0:
         cart = get_cart(context)  # <-- modificat aici
         cart[product_id] = cart.get(product_id, 0) + 1
         save_cart(context, cart)  # <-- modificat aici
-        await query.message.reply_text(f"{product['name']} a fost adăugat în coș! 🛒")
+        text = f"{product['name']} a fost adăugat în coș! 🛒"
     else:
-        await query.message.reply_text("Ne pare rău, acest produs nu este în stoc.")
-    keyboard = [
-        [InlineKeyboardButton("Vezi coșul", callback_data="cart")],
-        [InlineKeyboardButton("Înapoi la categorie", callback_data="back_to_products")],
-        [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.message.reply_text("Ce mai dorești să faci?", reply_markup=reply_markup)
+        text = "Ne pare rău, acest produs nu este în stoc."
+    await navigator.show_text(query, f"{text}\n\nCe mai dorești să faci?", AFTER_ADD_TO_CART)
     return ADD_TO_CART
 
 # Procesul de finalizare a comenzii
@@ -297,11 +356,9 @@ async def checkout(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return CHOOSE_CATEGORY
     cart = get_cart(context)
     if not cart:
-        keyboard = [[InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.message.reply_text("Coșul tău este gol! 🛒", reply_markup=reply_markup)
+        await navigator.show_text(query, "Coșul tău este gol! 🛒", BACK_TO_MENU)
         return CHOOSE_CATEGORY
-    await query.message.reply_text("Te rugăm să ne spui numele tău:")
+    await navigator.show_text(query, "Te rugăm să ne spui numele tău:")
     return CHECKOUT_NAME
 
 async def checkout_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -325,22 +382,12 @@ async def checkout_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         context.user_data["order"]["email"] = ""
     cart = get_cart(context)
+    priced = await get_priced_cart(cart)
     order_details = "📦 **Comanda ta**:\n"
-    total = 0
-    for product_id, quantity in cart.items():
-        product = get_product_by_id(product_id)
-        subtotal = product["price"] * quantity
-        total += subtotal
-        order_details += f"{product['name']} x{quantity}: {subtotal} RON\n"
-    order_details += f"\n**Total**: {total} RON\n"
+    order_details += format_cart_lines(priced)
+    order_details += f"\n**Total**: {priced['total']} RON\n"
     order_details += f"\n**Detalii client**:\nNume: {context.user_data['order']['name']}\nTelefon: {context.user_data['order']['phone']}\nAdresă: {context.user_data['order']['address']}\nEmail: {context.user_data['order']['email'] or 'Nefurnizat'}"
-    keyboard = [
-        [InlineKeyboardButton("Confirmă comanda", callback_data="confirm_order")],
-        [InlineKeyboardButton("Anulează", callback_data="cancel_order")],
-        [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(order_details, reply_markup=reply_markup, parse_mode="Markdown")
+    await update.message.reply_text(order_details, reply_markup=CONFIRM_ORDER_KEYBOARD, parse_mode="Markdown")
     return CONFIRM_ORDER
 
 async def confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -350,39 +397,40 @@ async def confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await start(update, context)
         return CHOOSE_CATEGORY
     
-    # Construim mesajul pentru admin
     cart = get_cart(context)
-    order_id = str(uuid.uuid4())
-    order_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    order_details = f"📦 **Comandă nouă (ID: {order_id})** ({order_time}):\n"
-    total = 0
-    for product_id, quantity in cart.items():
-        product = get_product_by_id(product_id)
-        subtotal = product["price"] * quantity
-        total += subtotal
-        order_details += f"{product['name']} x{quantity}: {subtotal} RON\n"
-    order_details += f"\n**Total**: {total} RON\n"
-    order_details += f"\n**Detalii client**:\nNume: {context.user_data['order']['name']}\nTelefon: {context.user_data['order']['phone']}\nAdresă: {context.user_data['order']['address']}\nEmail: {context.user_data['order']['email'] or 'Nefurnizat'}"
-    
-    # Trimitem comanda către chatul adminului
+    priced = await get_priced_cart(cart)
+    # Coșul poate fi gol (confirmare repetată) sau poate conține doar produse scoase din catalog
+    if not priced["lines"]:
+        await navigator.show_text(query, "Coșul tău este gol! 🛒", BACK_TO_MENU)
+        return CHOOSE_CATEGORY
+    order = dict(context.user_data["order"])
+    order["id"] = str(uuid.uuid4())
+    order["user_id"] = update.effective_user.id
+    order["created_at"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    # Salvăm comanda și rezervăm stocul pentru tot coșul, într-o singură tranzacție
     try:
-        chat_id = int(os.getenv("ADMIN_CHAT_ID"))
-        await context.bot.send_message(
-             chat_id=chat_id,
-             text=order_details,
-             parse_mode="Markdown"
-        ) 
-        
-        await query.message.reply_text("Comanda ta a fost plasată cu succes! 🎉 Îți mulțumim!")
+        await db.run(place_order, order, priced, order_pipeline.lease())
+    except OutOfStockError as e:
+        await query.message.reply_text(
+            f"Ne pare rău, nu mai avem suficient stoc pentru: {', '.join(e.products)}. "
+            "Te rugăm să modifici coșul."
+        )
+        return CHOOSE_CATEGORY
     except Exception as e:
-        logger.error(f"Eroare la trimiterea comenzii către admin: {e}")
+        logger.error(f"Eroare la salvarea comenzii: {e}")
         await query.message.reply_text("Am întâmpinat o problemă la procesarea comenzii. Te rugăm să încerci din nou mai târziu.")
         return CHOOSE_CATEGORY
 
+    # Adminul este notificat în fundal; clientul nu așteaptă după Telegram
+    order_pipeline.submit(order["id"], format_admin_message(order, priced))
+    await navigator.show_text(query, "Comanda ta a fost plasată cu succes! 🎉 Îți mulțumim!")
+
     # Golește coșul și detaliile comenzii
     context.user_data["cart"] = {}
     context.user_data["order"] = {}
-    await start(update, context)
+    # Meniul vine într-un mesaj nou, ca confirmarea să rămână vizibilă
+    await query.message.reply_text(WELCOME_TEXT, reply_markup=MAIN_MENU)
     return CHOOSE_CATEGORY
 
 async def cancel_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -391,21 +439,17 @@ async def cancel_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query.data == "back_to_menu":
         await start(update, context)
         return CHOOSE_CATEGORY
-    await query.message.reply_text("Comanda a fost anulată.")
-    await start(update, context)
+    await navigator.show_text(query, "Comanda a fost anulată.")
+    await query.message.reply_text(WELCOME_TEXT, reply_markup=MAIN_MENU)
     return CHOOSE_CATEGORY
 
 async def skip(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["order"]["email"] = ""
     cart = get_cart(context)
+    priced = await get_priced_cart(cart)
     order_details = "📦 **Comanda ta**:\n"
-    total = 0
-    for product_id, quantity in cart.items():
-        product = get_product_by_id(product_id)
-        subtotal = product["price"] * quantity
-        total += subtotal
-        order_details += f"{product['name']} x{quantity}: {subtotal} RON\n"
-    order_details += f"\n**Total**: {total} RON\n"
+    order_details += format_cart_lines(priced)
+    order_details += f"\n**Total**: {priced['total']} RON\n"
     order_details += (
         f"\n**Detalii client**:\n"
         f"Nume: {context.user_data['order']['name']}\n"
@@ -413,13 +457,7 @@ async def skip(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"Adresă: {context.user_data['order']['address']}\n"
         f"Email: Nefurnizat"
     )
-    keyboard = [
-        [InlineKeyboardButton("Confirmă comanda", callback_data="confirm_order")],
-        [InlineKeyboardButton("Anulează", callback_data="cancel_order")],
-        [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(order_details, reply_markup=reply_markup, parse_mode="Markdown")
+    await update.message.reply_text(order_details, reply_markup=CONFIRM_ORDER_KEYBOARD, parse_mode="Markdown")
     return CONFIRM_ORDER
 # Gestionarea erorilor
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -429,23 +467,106 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif update.callback_query:
         await update.callback_query.message.reply_text("A apărut o eroare. Te rugăm să încerci din nou.")
 
-def main():
-    # Încarcă variabilele din fișierul .env
-    load_dotenv()
-    bot_token = os.getenv("BOT_TOKEN")
-    if not bot_token:
-        logger.error("Eroare: BOT_TOKEN nu este setat în fișierul .env")
-        return
-    if not os.getenv("ADMIN_CHAT_ID"):
-        logger.error("Eroare: ADMIN_CHAT_ID nu este setat în fișierul .env")
-        return
-
-    # Inițializează aplicația cu token-ul din .env
-    application = Application.builder().token(bot_token).build()
+# Sarcini de fundal pornite după inițializare și oprite odată cu aplicația
+background_tasks = []
+metrics_servers = []
+
+# Cache-urile (catalog, file_id-uri) se încarcă în fundal, după ce botul primește deja
+# update-uri; până atunci handler-ele le încarcă la nevoie
+async def warm_up(application: Application):
+    started = time.perf_counter()
+    await refresh_catalog()
+    await photo_cache.load()
+    logger.info(f"Cache-uri încărcate în {time.perf_counter() - started:.2f}s")
+    prewarm_chat_id = os.getenv("PHOTO_PREWARM_CHAT_ID")
+    if prewarm_chat_id and WORKER_INDEX == 0:
+        await photo_cache.prewarm(application.bot, int(prewarm_chat_id), catalog.all_products())
+
+async def on_startup(application: Application):
+    # initialize(): getMe și încărcarea conversațiilor salvate
+    startup.mark("initialize")
+    await db.run(ensure_schema)
+    if hasattr(signal, "SIGUSR1"):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, reload_catalog)
+    background_tasks.append(asyncio.create_task(warm_up(application)))
+    background_tasks.append(asyncio.create_task(
+        recommender.refresh_periodically(float(os.getenv("RECOMMENDATIONS_REFRESH_INTERVAL", "300")))
+    ))
+    background_tasks.append(asyncio.create_task(order_pipeline.run(application.bot, int(os.getenv("ADMIN_CHAT_ID")))))
+    background_tasks.append(asyncio.create_task(order_pipeline.keep_leases()))
+    stats_interval = float(os.getenv("QUEUE_STATS_INTERVAL", "60"))
+    if stats_interval > 0:
+        background_tasks.append(asyncio.create_task(log_queue_stats(application, stats_interval)))
+    compact_interval = float(os.getenv("PERSISTENCE_COMPACT_INTERVAL", "3600"))
+    if application.persistence and compact_interval > 0 and WORKER_INDEX == 0:
+        background_tasks.append(asyncio.create_task(compact_periodically(application.persistence, compact_interval)))
+    if metrics:
+        metrics_interval = float(os.getenv("METRICS_LOG_INTERVAL", "0"))
+        if metrics_interval > 0:
+            background_tasks.append(asyncio.create_task(metrics.log_periodically(metrics_interval)))
+        metrics_port = os.getenv("METRICS_PORT")
+        if metrics_port:
+            metrics_servers.append(await start_metrics_server(
+                metrics, os.getenv("METRICS_LISTEN", "127.0.0.1"), int(metrics_port)
+            ))
+    startup.mark("post_init")
+    logger.info(f"Pornire: {startup.summary()}")
+
+async def on_stop(application: Application):
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    for server in metrics_servers:
+        server.close()
+        await server.wait_closed()
+    metrics_servers.clear()
+
+# Eliberează resursele la oprirea aplicației
+async def on_shutdown(application: Application):
+    if application.persistence:
+        application.persistence.close()
+    db.close()
+    catalog.close()
+
+# request permite înlocuirea Bot API-ului (de ex. cu fake_api.FakeBotAPI pentru teste și benchmark)
+def build_application(bot_token: str, request=None) -> Application:
+    # Inițializează aplicația cu token-ul din .env.
+    # Coada de update-uri este limitată: în mod webhook, o coadă plină înseamnă
+    # 503 pentru Telegram, iar în mod polling preluarea de update-uri așteaptă.
+    update_queue = asyncio.Queue(maxsize=int(os.getenv("UPDATE_QUEUE_SIZE", "1000")))
+    # Coșurile și starea conversațiilor supraviețuiesc repornirilor; scrierile se fac
+    # în loturi, la fiecare PERSISTENCE_INTERVAL secunde
+    persistence = SQLitePersistence(
+        os.getenv("STATE_DB_PATH", "user_state.db"),
+        update_interval=float(os.getenv("PERSISTENCE_INTERVAL", "5")),
+    )
+    # Trimiterile către Telegram trec prin limitatorul global și per chat
+    rate_limiter = OutboundRateLimiter(
+        global_rate=float(os.getenv("RATE_LIMIT_GLOBAL", "30")),
+        chat_rate=float(os.getenv("RATE_LIMIT_CHAT", "1")),
+        chat_burst=float(os.getenv("RATE_LIMIT_CHAT_BURST", "3")),
+    )
+    builder = (
+        Application.builder()
+        .application_class(OrderedApplication)
+        .token(bot_token)
+        .update_queue(update_queue)
+        .persistence(persistence)
+        .rate_limiter(rate_limiter)
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+    )
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+    # Utilizatori diferiți sunt procesați în paralel, fiecare utilizator în ordine
+    application.set_concurrent_workers(int(os.getenv("CONCURRENT_WORKERS", "16")))
 
     # ConversationHandler pentru fluxul de comandă
     conv_handler = ConversationHandler(
-    entry_points=[CommandHandler("start", start), CallbackQueryHandler(button)],
+    entry_points=[CommandHandler("start", start), CommandHandler("search", search), CallbackQueryHandler(button)],
     states={
         CHOOSE_CATEGORY: [
             CallbackQueryHandler(choose_category, pattern="^category_|^back_to_menu$"),
@@ -454,6 +575,7 @@ def main():
         ],
         CHOOSE_PRODUCT: [
             CallbackQueryHandler(product_details, pattern="^product_|^back_to_products$|^back_to_menu$"),
+            CallbackQueryHandler(change_page, pattern="^page_"),
             CallbackQueryHandler(button, pattern="^products$|^back_to_menu$")
         ],
         PRODUCT_DETAILS: [
@@ -476,13 +598,88 @@ def main():
             CallbackQueryHandler(cancel_order, pattern="^cancel_order$|^back_to_menu$"),
         ],
     },
-    fallbacks=[CommandHandler("start", start)],
+    fallbacks=[CommandHandler("start", start), CommandHandler("search", search)],
+    name="order_conversation",
+    persistent=True,
 )
 
+    if metrics:
+        instrument_conversation(conv_handler, metrics)
+        persistence.db.metrics = metrics
+        rate_limiter.metrics = metrics
+        metrics.add_collector("updates", application.stats)
+        metrics.add_collector("rate_limiter", rate_limiter.stats)
+
     application.add_handler(conv_handler)
+    application.add_handler(InlineQueryHandler(timed_callback(inline_query, metrics) if metrics else inline_query))
+    application.add_handler(TypeHandler(Update, startup.record_first_update), group=-1)
     application.add_error_handler(error_handler)
+    startup.mark("build")
+    return application
+
+def main():
+    # Încarcă variabilele din fișierul .env
+    load_dotenv()
+    bot_token = os.getenv("BOT_TOKEN")
+    if not bot_token:
+        logger.error("Eroare: BOT_TOKEN nu este setat în fișierul .env")
+        return
+    if not os.getenv("ADMIN_CHAT_ID"):
+        logger.error("Eroare: ADMIN_CHAT_ID nu este setat în fișierul .env")
+        return
+
+    # WORKER_PROCESSES > 1 (doar în mod polling): un proces primește update-urile
+    # și le împarte după utilizator între procesele care rulează botul
+    worker_processes = int(os.getenv("WORKER_PROCESSES", "1"))
+    if worker_processes > 1 and os.getenv("BOT_MODE", "polling") != "webhook":
+        # Schema se actualizează o singură dată, înainte de pornirea proceselor: altfel toate
+        # ar aplica aceleași modificări în paralel (ALTER TABLE duplicat)
+        conn = db.connect()
+        try:
+            ensure_schema(conn)
+        finally:
+            conn.close()
+        run_cluster(bot_token, worker_processes)
+        return
+
+    # FAKE_BOT_API=1 (doar în mod webhook): apelurile Bot API sunt simulate local, ca botul
+    # să poată fi testat fără rețea, trimițând update-uri direct serverului webhook
+    request = None
+    if os.getenv("FAKE_BOT_API", "0") == "1":
+        if os.getenv("BOT_MODE", "polling") != "webhook":
+            logger.error("Eroare: FAKE_BOT_API=1 funcționează doar cu BOT_MODE=webhook")
+            return
+        logger.warning("FAKE_BOT_API=1: botul nu comunică cu Telegram")
+        request = FakeBotAPI()
+
+    application = build_application(bot_token, request=request)
+
+    # BOT_MODE=webhook pornește serverul HTTP propriu în locul polling-ului
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        secret_token = os.getenv("WEBHOOK_SECRET")
+        if not secret_token:
+            logger.error("Eroare: WEBHOOK_SECRET nu este setat în fișierul .env")
+            return
+        path = os.getenv("WEBHOOK_PATH", "/telegram")
+        server = WebhookServer(
+            application,
+            path=path,
+            secret_token=secret_token,
+            host=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8443"))),
+        )
+        # Metricile nu sunt expuse pe serverul webhook (public), doar pe METRICS_PORT
+        if metrics:
+            metrics.add_collector("webhook", lambda: {"accepted": server.accepted, "rejected": server.rejected})
+        webhook_url = os.getenv("WEBHOOK_URL", "")
+        if webhook_url:
+            webhook_url = webhook_url.rstrip("/") + path
+        asyncio.run(run_webhook(application, server, webhook_url))
+    else:
+        application.run_polling()
 
-    application.run_polling()
+# Până aici: importurile și obiectele de la nivelul modulului (fără I/O)
+startup.mark("import")
 
 if __name__ == "__main__":
     main()
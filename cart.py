@@ -0,0 +1,44 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Cheile coșului pot ajunge ca text (de ex. după serializare JSON); le normalizăm la int
+def normalize_cart(cart: dict) -> dict:
+    return {int(product_id): quantity for product_id, quantity in cart.items()}
+
+
+# Încarcă dintr-o singură interogare produsele care lipsesc din cache
+async def _fetch_products(db, product_ids: list) -> dict:
+    placeholders = ",".join("?" for _ in product_ids)
+    rows = await db.fetchall(f"SELECT * FROM products WHERE id IN ({placeholders})", tuple(product_ids))
+    return {row["id"]: row for row in rows}
+
+
+# Calculează prețul întregului coș: liniile, subtotalurile și totalul.
+# Produsele vin din cache-ul catalogului; cele lipsă se rezolvă cu un singur WHERE id IN (...).
+async def price_cart(cart: dict, catalog, db) -> dict:
+    cart = normalize_cart(cart)
+    products = catalog.products(cart.keys())
+    missing = [product_id for product_id in cart if product_id not in products]
+    if missing:
+        products.update(await _fetch_products(db, missing))
+
+    lines = []
+    total = 0
+    for product_id, quantity in cart.items():
+        product = products.get(product_id)
+        if not product:
+            logger.warning(f"Produsul {product_id} din coș nu mai există")
+            continue
+        subtotal = round(product["price"] * quantity, 2)
+        total += subtotal
+        lines.append({"product": product, "quantity": quantity, "subtotal": subtotal})
+    return {"lines": lines, "total": round(total, 2)}
+
+
+def format_cart_lines(priced_cart: dict) -> str:
+    return "".join(
+        f"{line['product']['name']} x{line['quantity']}: {line['subtotal']} RON\n"
+        for line in priced_cart["lines"]
+    )
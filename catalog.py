@@ -0,0 +1,303 @@
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Index pentru parcurgerea produselor pe categorii și index full-text (FTS5) pentru căutare.
+# products_fts folosește tabela products ca sursă (external content) și e ținut la zi prin triggere.
+CATALOG_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id, id)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, content='products', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    # Semnalul de schimbare pentru CatalogCache: revision crește la orice modificare a produselor
+    # sau categoriilor, stock_revision doar la schimbarea stocului. Comenzile, statisticile de
+    # vânzări și file_id-urile pozelor nu ating aceste valori.
+    """
+    CREATE TABLE IF NOT EXISTS catalog_changes (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        revision INTEGER NOT NULL,
+        stock_revision INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO catalog_changes (id, revision, stock_revision) VALUES (1, 0, 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS products_changes_insert AFTER INSERT ON products BEGIN
+        UPDATE catalog_changes SET revision = revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_changes_delete AFTER DELETE ON products BEGIN
+        UPDATE catalog_changes SET revision = revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_changes_update AFTER UPDATE OF id, name, description, price, image, category_id ON products BEGIN
+        UPDATE catalog_changes SET revision = revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_changes_stock AFTER UPDATE OF stock ON products BEGIN
+        UPDATE catalog_changes SET stock_revision = stock_revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_changes_insert AFTER INSERT ON categories BEGIN
+        UPDATE catalog_changes SET revision = revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_changes_delete AFTER DELETE ON categories BEGIN
+        UPDATE catalog_changes SET revision = revision + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_changes_update AFTER UPDATE ON categories BEGIN
+        UPDATE catalog_changes SET revision = revision + 1;
+    END
+    """,
+]
+
+
+def create_catalog_schema(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone()
+    with conn:
+        for statement in CATALOG_SCHEMA:
+            conn.execute(statement)
+        # La prima creare indexul full-text se populează din produsele existente
+        if not exists:
+            conn.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+# Transformă textul utilizatorului într-o interogare FTS5 sigură: fiecare cuvânt devine prefix
+def fts_query(text: str) -> str:
+    words = ["".join(ch for ch in word if ch.isalnum()) for word in text.split()]
+    return " ".join(f'"{word}"*' for word in words if word)
+
+
+# Caută produse după nume și descriere; rezultatele cele mai relevante primele
+def search_products(conn, text: str, limit: int = 10) -> list:
+    query = fts_query(text)
+    if not query:
+        return []
+    rows = conn.execute(
+        "SELECT rowid AS id FROM products_fts WHERE products_fts MATCH ? ORDER BY bm25(products_fts) LIMIT ?",
+        (query, limit),
+    ).fetchall()
+    return [row["id"] for row in rows]
+
+
+# Cache în memorie pentru categorii și produse.
+# Datele sunt încărcate o singură dată și indexate după id și după numele categoriei.
+# PRAGMA data_version spune ieftin dacă s-a scris ceva în baza de date; catalog_changes spune
+# ce anume: reîncărcarea completă are loc doar când s-au schimbat produsele sau categoriile,
+# iar o schimbare de stoc (de exemplu o comandă) actualizează doar stocul, pe loc.
+class CatalogCache:
+    def __init__(self, db_path: str, check_interval: float = 1.0):
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.stock_updates = 0
+        # Crește la fiecare reîncărcare; folosit de alte cache-uri pentru invalidare
+        self.version = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self._revisions = None
+        self._last_check = 0.0
+        self._categories = []
+        self._category_names = {}
+        self._products_by_id = {}
+        self._products_by_category = {}
+
+    def _connect(self):
+        # Conexiune dedicată, de lungă durată: data_version se schimbă doar
+        # pentru commit-uri făcute de alte conexiuni
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _load(self):
+        cur = self._conn.cursor()
+        cur.execute("SELECT id, name FROM categories ORDER BY id")
+        category_rows = cur.fetchall()
+        cur.execute("SELECT * FROM products ORDER BY id")
+        product_rows = cur.fetchall()
+
+        category_names = {row["id"]: row["name"] for row in category_rows}
+        products_by_id = {}
+        products_by_category = {row["name"]: [] for row in category_rows}
+        for row in product_rows:
+            product = dict(row)
+            products_by_id[product["id"]] = product
+            category = category_names.get(product["category_id"])
+            if category is not None:
+                products_by_category[category].append(product)
+
+        self._categories = [row["name"] for row in category_rows]
+        self._category_names = category_names
+        self._products_by_id = products_by_id
+        self._products_by_category = products_by_category
+        self.version += 1
+        self.reloads += 1
+        logger.info(f"Catalog încărcat: {len(self._categories)} categorii, {len(products_by_id)} produse")
+
+    # Stocul se schimbă la fiecare comandă: valorile sunt actualizate în aceleași dicționare,
+    # fără a incrementa version (tastaturile și rezultatele căutării rămân valabile)
+    def _load_stock(self):
+        changed = 0
+        for row in self._conn.execute("SELECT id, stock FROM products"):
+            product = self._products_by_id.get(row["id"])
+            if product is not None and product["stock"] != row["stock"]:
+                product["stock"] = row["stock"]
+                changed += 1
+        self.stock_updates += 1
+        logger.debug(f"Stoc actualizat pentru {changed} produse")
+
+    # (revision, stock_revision) din catalog_changes; None dacă tabela nu există încă
+    def _read_revisions(self):
+        try:
+            row = self._conn.execute("SELECT revision, stock_revision FROM catalog_changes").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return tuple(row) if row else None
+
+    # Adevărat dacă a trecut check_interval de la ultima verificare
+    def due(self) -> bool:
+        return self._conn is None or time.monotonic() - self._last_check >= self.check_interval
+
+    # Verifică (cel mult o dată la check_interval secunde) dacă baza de date s-a schimbat.
+    # Face I/O pe disc: din handler-e se apelează prin pool-ul bazei de date.
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and not self.due():
+            return
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            self._last_check = now
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if not force and data_version == self._data_version:
+                return
+            self._data_version = data_version
+            revisions = self._read_revisions()
+            previous = self._revisions
+            self._revisions = revisions
+            if force or revisions is None or previous is None or revisions[0] != previous[0]:
+                self._load()
+            elif revisions[1] != previous[1]:
+                self._load_stock()
+
+    def invalidate(self):
+        self.refresh(force=True)
+
+    # Getter-ele nu fac I/O; doar prima utilizare, înainte de orice refresh, încarcă datele
+    def _ensure_loaded(self):
+        if self._conn is None:
+            self.refresh()
+
+    def _count(self, found: bool):
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def categories(self) -> list:
+        self._ensure_loaded()
+        self._count(True)
+        return list(self._categories)
+
+    def has_category(self, category_name: str) -> bool:
+        self._ensure_loaded()
+        found = category_name in self._products_by_category
+        self._count(found)
+        return found
+
+    def products_by_category(self, category_name: str) -> list:
+        self._ensure_loaded()
+        products = self._products_by_category.get(category_name)
+        self._count(products is not None)
+        return [dict(p) for p in products] if products else []
+
+    def product(self, product_id: int):
+        self._ensure_loaded()
+        product = self._products_by_id.get(product_id)
+        self._count(product is not None)
+        return dict(product) if product else None
+
+    # Categoria unui produs și pagina pe care apare în lista categoriei (None dacă nu există)
+    def product_location(self, product_id: int, page_size: int):
+        self._ensure_loaded()
+        product = self._products_by_id.get(product_id)
+        category = self._category_names.get(product["category_id"]) if product else None
+        if category is None:
+            return None, 0
+        products = self._products_by_category[category]
+        index = next((i for i, p in enumerate(products) if p["id"] == product_id), 0)
+        return category, index // page_size
+
+    def all_products(self) -> list:
+        self._ensure_loaded()
+        return [dict(p) for p in self._products_by_id.values()]
+
+    # O pagină din produsele unei categorii și numărul total de pagini
+    def products_page(self, category_name: str, page: int, page_size: int):
+        self._ensure_loaded()
+        products = self._products_by_category.get(category_name)
+        self._count(products is not None)
+        if not products:
+            return [], 0
+        pages = (len(products) + page_size - 1) // page_size
+        page = max(0, min(page, pages - 1))
+        start = page * page_size
+        return [dict(p) for p in products[start:start + page_size]], pages
+
+    # Mai multe produse deodată: {id: produs}; id-urile necunoscute lipsesc din rezultat
+    def products(self, product_ids) -> dict:
+        self._ensure_loaded()
+        found = {}
+        for product_id in product_ids:
+            product = self._products_by_id.get(product_id)
+            self._count(product is not None)
+            if product:
+                found[product_id] = dict(product)
+        return found
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "stock_updates": self.stock_updates,
+            "version": self.version,
+            "categories": len(self._categories),
+            "products": len(self._products_by_id),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+
+from telegram import Bot, Update
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+from concurrency import update_key
+
+logger = logging.getLogger(__name__)
+
+
+# Procesul care primește update-urile unui utilizator: mereu același, ca ordinea să fie păstrată
+def shard(update: Update, workers: int) -> int:
+    key = update_key(update)
+    return 0 if key is None else key % workers
+
+
+# Rulează aplicația într-un proces worker: update-urile vin (ca JSON) din coada procesului
+# și intră în coada aplicației, exact ca la polling.
+async def run_worker(application, updates):
+    loop = asyncio.get_running_loop()
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.start()
+        while True:
+            payload = await loop.run_in_executor(None, updates.get)
+            if payload is None:
+                break
+            try:
+                update = Update.de_json(json.loads(payload), application.bot)
+            except (ValueError, TypeError, KeyError) as e:
+                logger.error(f"Update invalid primit de la receptor: {e}")
+                continue
+            await application.update_queue.put(update)
+    finally:
+        # stop() procesează întâi update-urile rămase în coadă
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def _worker_main(index: int, workers: int, bot_token: str, updates):
+    # Oprirea e coordonată de receptor (trimite None), nu de semnale
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # SIGUSR1 vine blocat de la receptor (vezi _start_worker): până când botul își instalează
+    # handler-ul, semnalul e ignorat, pentru că catalogul se încarcă oricum la pornire
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGUSR1})
+    os.environ["WORKER_INDEX"] = str(index)
+    # Limita globală Telegram e împărțită între procese; limitele per chat rămân aceleași,
+    # pentru că un chat privat e servit mereu de același proces
+    os.environ["RATE_LIMIT_GLOBAL"] = str(float(os.getenv("RATE_LIMIT_GLOBAL", "30")) / workers)
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        os.environ["METRICS_PORT"] = str(int(metrics_port) + index)
+
+    import bot
+
+    asyncio.run(run_worker(bot.build_application(bot_token), updates))
+
+
+# Receptorul: preia update-urile prin getUpdates și le împarte între procese după utilizator.
+# Starea utilizatorilor (coș, conversație) e în user_state.db, comună tuturor proceselor;
+# catalogul, comenzile și recomandările sunt în cosmetics.db.
+class ClusterReceiver:
+    def __init__(self, bot_token: str, workers: int, queue_size: int = 1000, poll_timeout: int = 30,
+                 put_timeout: float = 1.0, check_interval: float = 1.0):
+        self.bot_token = bot_token
+        self.workers = workers
+        self.queue_size = queue_size
+        self.poll_timeout = poll_timeout
+        self.put_timeout = put_timeout
+        self.check_interval = check_interval
+        self._context = multiprocessing.get_context("spawn")
+        self.queues = [self._context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.processes = [None] * workers
+        self.dispatched = [0] * workers
+        self.restarts = 0
+
+    def _start_worker(self, index: int):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.workers, self.bot_token, self.queues[index]),
+            name=f"bot-worker-{index}",
+        )
+        # Procesul nou moștenește masca de semnale: un SIGUSR1 primit înainte să-l poată
+        # trata rămâne blocat, în loc să-l oprească
+        if hasattr(signal, "SIGUSR1"):
+            signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGUSR1})
+        try:
+            process.start()
+        finally:
+            if hasattr(signal, "SIGUSR1"):
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGUSR1})
+        self.processes[index] = process
+        logger.info(f"Procesul worker {index} pornit (pid {process.pid})")
+
+    # Un worker căzut este repornit cu o coadă nouă: dacă a fost oprit în timp ce aștepta în
+    # get(), lock-ul de citire al cozii vechi rămâne luat pentru totdeauna. Update-urile
+    # rămase în coada veche se pierd.
+    def _restart_worker(self, index: int):
+        process = self.processes[index]
+        logger.error(f"Procesul worker {index} s-a oprit (cod {process.exitcode}); îl repornim")
+        old = self.queues[index]
+        try:
+            lost = old.qsize()
+        except NotImplementedError:
+            lost = None
+        if lost:
+            logger.error(f"{lost} update-uri din coada procesului worker {index} s-au pierdut")
+        old.cancel_join_thread()
+        old.close()
+        self.queues[index] = self._context.Queue(maxsize=self.queue_size)
+        self.restarts += 1
+        self._start_worker(index)
+
+    def _check_workers(self):
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                self._restart_worker(index)
+
+    # Verificarea proceselor nu depinde de long polling (care poate dura poll_timeout secunde)
+    async def _monitor_workers(self, stop: asyncio.Event):
+        while not stop.is_set():
+            self._check_workers()
+            try:
+                await asyncio.wait_for(stop.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # Coada plină blochează receptorul (backpressure), fără a bloca bucla de evenimente.
+    # Așteptarea e făcută în pași de put_timeout, iar între ei se verifică dacă worker-ul
+    # mai trăiește. Întoarce False dacă receptorul se oprește înainte de distribuire.
+    async def _dispatch(self, update: Update, stop: asyncio.Event) -> bool:
+        index = shard(update, self.workers)
+        payload = json.dumps(update.to_dict(), ensure_ascii=False)
+        loop = asyncio.get_running_loop()
+        process = self.processes[index]
+        if process is not None and not process.is_alive():
+            self._restart_worker(index)
+        while True:
+            updates = self.queues[index]
+            try:
+                updates.put_nowait(payload)
+                break
+            except queue.Full:
+                pass
+            try:
+                await loop.run_in_executor(None, updates.put, payload, True, self.put_timeout)
+                break
+            except (queue.Full, ValueError):
+                # ValueError: coada a fost înlocuită (și închisă) între timp
+                if stop.is_set():
+                    return False
+                self._check_workers()
+        self.dispatched[index] += 1
+        return True
+
+    async def _poll(self, stop: asyncio.Event):
+        bot = Bot(self.bot_token)
+        async with bot:
+            await bot.delete_webhook()
+            offset = None
+            stopped = asyncio.create_task(stop.wait())
+            while not stop.is_set():
+                fetch = asyncio.create_task(bot.get_updates(
+                    offset=offset,
+                    timeout=self.poll_timeout,
+                    read_timeout=self.poll_timeout + 10,
+                    allowed_updates=Update.ALL_TYPES,
+                ))
+                await asyncio.wait({fetch, stopped}, return_when=asyncio.FIRST_COMPLETED)
+                if not fetch.done():
+                    fetch.cancel()
+                    break
+                try:
+                    updates = fetch.result()
+                except RetryAfter as e:
+                    await asyncio.sleep(float(e.retry_after))
+                    continue
+                except TimedOut:
+                    continue
+                except NetworkError as e:
+                    logger.error(f"Eroare la preluarea update-urilor: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                for update in updates:
+                    # Un update nedistribuit nu e confirmat: Telegram îl retrimite la repornire
+                    if not await self._dispatch(update, stop):
+                        break
+                    offset = update.update_id + 1
+            stopped.cancel()
+            # Confirmă la Telegram update-urile deja distribuite
+            if offset is not None:
+                try:
+                    await bot.get_updates(offset=offset, timeout=0, limit=1)
+                except Exception as e:
+                    logger.error(f"Eroare la confirmarea update-urilor: {e}")
+
+    async def _stop_workers(self, timeout: float = 30.0):
+        loop = asyncio.get_running_loop()
+        for index, process in enumerate(self.processes):
+            if process is None or not process.is_alive():
+                continue
+            try:
+                await loop.run_in_executor(None, self.queues[index].put, None, True, timeout)
+            except queue.Full:
+                logger.error(f"Procesul worker {index} nu mai preia update-uri")
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.error(f"Procesul worker {index} nu s-a oprit la timp")
+                process.terminate()
+                # Nimeni nu mai citește coada: ieșirea nu trebuie să aștepte golirea ei
+                self.queues[index].cancel_join_thread()
+        logger.info(f"Update-uri distribuite pe procese: {self.dispatched}")
+
+    # import_catalog.py --notify-pid trimite SIGUSR1 receptorului; catalogul e în procesele worker
+    def _forward_signal(self, signum: int):
+        for index, process in enumerate(self.processes):
+            if process is not None and process.is_alive():
+                try:
+                    os.kill(process.pid, signum)
+                except OSError as e:
+                    logger.error(f"Semnalul nu a putut fi trimis procesului worker {index}: {e}")
+
+    async def run(self):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        if hasattr(signal, "SIGUSR1"):
+            loop.add_signal_handler(signal.SIGUSR1, self._forward_signal, signal.SIGUSR1)
+        for index in range(self.workers):
+            self._start_worker(index)
+        monitor = asyncio.create_task(self._monitor_workers(stop))
+        try:
+            await self._poll(stop)
+        finally:
+            stop.set()
+            await monitor
+            await self._stop_workers()
+
+
+def run_cluster(bot_token: str, workers: int):
+    receiver = ClusterReceiver(bot_token, workers, queue_size=int(os.getenv("UPDATE_QUEUE_SIZE", "1000")))
+    asyncio.run(receiver.run())
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+
+# Cheia după care se serializează update-urile: utilizatorul, apoi chatul
+def update_key(update: object):
+    if isinstance(update, Update):
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+    return None
+
+
+# Application care procesează în paralel update-urile unor utilizatori diferiți,
+# dar în ordine pe cele ale aceluiași utilizator, astfel încât starea din
+# ConversationHandler și coșul din user_data rămân consistente.
+# Cel mult `concurrent_workers` utilizatori sunt procesați simultan; când toți
+# worker-ii sunt ocupați, preluarea din coada de update-uri așteaptă.
+class OrderedApplication(Application):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.concurrent_workers = 0
+        self._worker_slots = None
+        self._user_queues = {}
+        self.processed_updates = 0
+        self.max_pending = 0
+        self.total_wait = 0.0
+
+    def set_concurrent_workers(self, workers: int):
+        self.concurrent_workers = workers
+        self._worker_slots = asyncio.Semaphore(workers) if workers > 0 else None
+
+    async def process_update(self, update: object) -> None:
+        key = update_key(update)
+        if self._worker_slots is None or key is None:
+            await super().process_update(update)
+            return
+
+        pending = self._user_queues.get(key)
+        if pending is not None:
+            # Utilizatorul are deja un worker activ: update-ul așteaptă la rând
+            pending.append((update, time.monotonic()))
+            self._track_pending()
+            return
+
+        await self._worker_slots.acquire()
+        # Worker-ul poate fi pornit între timp de un alt update al aceluiași utilizator
+        pending = self._user_queues.get(key)
+        if pending is not None:
+            self._worker_slots.release()
+            pending.append((update, time.monotonic()))
+            self._track_pending()
+            return
+        self._user_queues[key] = deque([(update, time.monotonic())])
+        self._track_pending()
+        self.create_task(self._run_user_queue(key))
+
+    async def _run_user_queue(self, key):
+        pending = self._user_queues[key]
+        try:
+            while pending:
+                update, queued_at = pending.popleft()
+                self.total_wait += time.monotonic() - queued_at
+                try:
+                    await super().process_update(update)
+                except Exception as e:
+                    logger.error(f"Eroare la procesarea update-ului pentru {key}: {e}")
+                self.processed_updates += 1
+        finally:
+            del self._user_queues[key]
+            self._worker_slots.release()
+
+    def _track_pending(self):
+        pending = self.pending_updates()
+        if pending > self.max_pending:
+            self.max_pending = pending
+
+    def pending_updates(self) -> int:
+        return sum(len(queue) for queue in self._user_queues.values())
+
+    def stats(self) -> dict:
+        processed = self.processed_updates
+        return {
+            "workers": self.concurrent_workers,
+            "active_users": len(self._user_queues),
+            "pending_updates": self.pending_updates(),
+            "max_pending_updates": self.max_pending,
+            "update_queue_size": self.update_queue.qsize(),
+            "processed_updates": processed,
+            "avg_wait_ms": round(self.total_wait / processed * 1000, 2) if processed else 0.0,
+        }
+
+
+# Scrie periodic în log adâncimea cozilor
+async def log_queue_stats(application: OrderedApplication, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f"Cozi update-uri: {application.stats()}")
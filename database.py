@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+# Acces asincron la SQLite: interogările rulează într-un pool dedicat de thread-uri,
+# fiecare cu propria conexiune de lungă durată (mod WAL), astfel încât
+# handler-ele nu blochează bucla de evenimente a botului.
+class Database:
+    def __init__(self, path: str, pool_size: int = 4, timeout: float = 10.0):
+        self.path = path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="db")
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # Numărul de apeluri trimise în pool (folosit de benchmark și metrici)
+        self.round_trips = 0
+        # metrics.Metrics, setat doar când metricile sunt activate
+        self.metrics = None
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # Conexiunea thread-ului curent din pool (creată la prima utilizare)
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, fn, args):
+        return fn(self._connection(), *args)
+
+    # Rulează fn(conn, *args) într-un thread din pool
+    async def run(self, fn, *args):
+        self.round_trips += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._call, fn, args)
+        if self.metrics is None:
+            return await future
+        return await self._timed(fn, future)
+
+    # Rulează o funcție oarecare (fără conexiune) în pool-ul bazei de date
+    async def run_sync(self, fn, *args):
+        self.round_trips += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, fn, *args)
+        if self.metrics is None:
+            return await future
+        return await self._timed(fn, future)
+
+    # Durata include și așteptarea unui thread liber din pool
+    async def _timed(self, fn, future):
+        started = time.perf_counter()
+        try:
+            return await future
+        finally:
+            self.metrics.observe(
+                "bot_db_query_duration_seconds",
+                time.perf_counter() - started,
+                db=os.path.basename(self.path),
+                query=getattr(fn, "__name__", "unknown").lstrip("_"),
+            )
+
+    async def fetchall(self, sql: str, params=()) -> list:
+        def _fetchall(conn):
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        return await self.run(_fetchall)
+
+    async def fetchone(self, sql: str, params=()):
+        def _fetchone(conn):
+            row = conn.execute(sql, params).fetchone()
+            return dict(row) if row else None
+        return await self.run(_fetchone)
+
+    async def execute(self, sql: str, params=()) -> int:
+        def _execute(conn):
+            with conn:
+                return conn.execute(sql, params).rowcount
+        return await self.run(_execute)
+
+    async def executemany(self, sql: str, seq_of_params) -> int:
+        def _executemany(conn):
+            with conn:
+                return conn.executemany(sql, seq_of_params).rowcount
+        return await self.run(_executemany)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict, deque
+
+from telegram.request import BaseRequest
+
+# Răspunsuri pentru apelurile care nu întorc un mesaj
+TRUE_ENDPOINTS = {
+    "answerCallbackQuery",
+    "answerInlineQuery",
+    "deleteMessage",
+    "setWebhook",
+    "deleteWebhook",
+}
+
+# Apelurile care pot modifica doar o tastatură inline
+EDIT_ENDPOINTS = {
+    "editMessageText",
+    "editMessageCaption",
+    "editMessageMedia",
+    "editMessageReplyMarkup",
+}
+
+REPLY_MARKUP_KINDS = ("inline_keyboard", "keyboard", "remove_keyboard", "force_reply")
+
+INLINE_BUTTON_ACTIONS = (
+    "callback_data",
+    "url",
+    "switch_inline_query",
+    "switch_inline_query_current_chat",
+    "web_app",
+    "login_url",
+    "pay",
+    "callback_game",
+)
+
+
+class InvalidRequest(ValueError):
+    pass
+
+
+def _check_rows(rows, kind: str):
+    if not isinstance(rows, list) or not all(isinstance(row, list) for row in rows):
+        raise InvalidRequest(f"field \"{kind}\" must be an Array of Array")
+    for row in rows:
+        for button in row:
+            if isinstance(button, str) and kind == "keyboard":
+                continue
+            if not isinstance(button, dict) or not isinstance(button.get("text"), str):
+                raise InvalidRequest("can't parse keyboard button: text is required")
+            if kind == "inline_keyboard":
+                actions = [action for action in INLINE_BUTTON_ACTIONS if action in button]
+                if len(actions) != 1:
+                    raise InvalidRequest("can't parse inline keyboard button: exactly one action is required")
+                data = button.get("callback_data")
+                if data is not None and (not isinstance(data, str) or not 1 <= len(data.encode()) <= 64):
+                    raise InvalidRequest("BUTTON_DATA_INVALID")
+
+
+# Aceleași verificări ca Bot API-ul real pentru reply_markup: un obiect JSON cu exact unul
+# dintre tipurile de tastatură, iar editările acceptă doar tastaturi inline
+def check_reply_markup(endpoint: str, markup):
+    if isinstance(markup, str):
+        try:
+            markup = json.loads(markup)
+        except ValueError:
+            raise InvalidRequest("can't parse reply keyboard markup JSON object")
+    if not isinstance(markup, dict):
+        raise InvalidRequest("can't parse reply keyboard markup JSON object")
+    kinds = [kind for kind in REPLY_MARKUP_KINDS if kind in markup]
+    if len(kinds) != 1:
+        raise InvalidRequest("object expected as reply markup")
+    kind = kinds[0]
+    if endpoint in EDIT_ENDPOINTS and kind != "inline_keyboard":
+        raise InvalidRequest("inline keyboard expected")
+    if kind in ("inline_keyboard", "keyboard"):
+        _check_rows(markup[kind], kind)
+
+
+# Bot API simulat local, fără rețea: răspunde la apelurile botului cu mesaje plauzibile,
+# poate adăuga latență și aplică limite de flood (HTTP 429 cu retry_after), ca la Telegram.
+# Se folosește cu Application.builder().request(FakeBotAPI()).
+class FakeBotAPI(BaseRequest):
+    def __init__(self, latency: float = 0.0, chat_limit: int = 0, global_limit: int = 0, window: float = 1.0):
+        self.latency = latency
+        self.chat_limit = chat_limit
+        self.global_limit = global_limit
+        self.window = window
+        self.calls = []
+        self.flood_errors = 0
+        self.bad_requests = 0
+        self._message_ids = itertools.count(1000)
+        self._chat_sends = defaultdict(deque)
+        self._global_sends = deque()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def read_timeout(self):
+        return None
+
+    def _count(self, sends: deque, limit: int, now: float) -> bool:
+        while sends and now - sends[0] > self.window:
+            sends.popleft()
+        if limit and len(sends) >= limit:
+            return False
+        sends.append(now)
+        return True
+
+    def _flood_error(self):
+        self.flood_errors += 1
+        body = {
+            "ok": False,
+            "error_code": 429,
+            "description": "Too Many Requests: retry after 1",
+            "parameters": {"retry_after": 1},
+        }
+        return 429, json.dumps(body).encode()
+
+    def _bad_request(self, error: InvalidRequest):
+        self.bad_requests += 1
+        body = {"ok": False, "error_code": 400, "description": f"Bad Request: {error}"}
+        return 400, json.dumps(body).encode()
+
+    def _result(self, endpoint: str, params: dict):
+        if endpoint == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        if endpoint in TRUE_ENDPOINTS:
+            return True
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+        }
+        if endpoint in ("sendPhoto", "editMessageMedia"):
+            message["photo"] = [{
+                "file_id": f"fake-{message['message_id']}",
+                "file_unique_id": f"u{message['message_id']}",
+                "width": 800,
+                "height": 600,
+            }]
+            message["caption"] = params.get("caption", "")
+        else:
+            message["text"] = params.get("text", "")
+        return message
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((endpoint, params))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if "reply_markup" in params:
+            try:
+                check_reply_markup(endpoint, params["reply_markup"])
+            except InvalidRequest as e:
+                return self._bad_request(e)
+
+        chat_id = params.get("chat_id")
+        if chat_id is not None and endpoint not in TRUE_ENDPOINTS:
+            now = time.monotonic()
+            if not self._count(self._global_sends, self.global_limit, now):
+                return self._flood_error()
+            if not self._count(self._chat_sends[chat_id], self.chat_limit, now):
+                return self._flood_error()
+
+        return 200, json.dumps({"ok": True, "result": self._result(endpoint, params)}).encode()
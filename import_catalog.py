@@ -0,0 +1,262 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import signal
+import sqlite3
+import sys
+import time
+
+from catalog import CATALOG_SCHEMA, create_catalog_schema
+
+# Import/sincronizare a catalogului dintr-un fișier CSV sau JSONL, fără oprirea botului:
+#
+#   python import_catalog.py produse.csv
+#   python import_catalog.py produse.jsonl --missing zero --notify-pid $(pgrep -f bot.py)
+#
+# Coloane: id, name, description, price, image, stock și category (numele categoriei,
+# creată dacă nu există) sau category_id. Rândurile sunt comparate cu produsele existente
+# după id; se scriu doar produsele noi sau modificate. Botul observă schimbarea singur
+# (tabela catalog_changes), iar --notify-pid îi cere reîncărcarea imediată (SIGUSR1).
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+# Peste acest număr de produse noi/modificate, indexul și triggerele FTS sunt eliminate
+# pe durata importului și reconstruite o singură dată la final
+REBUILD_THRESHOLD = 1000
+
+FEED_SCHEMA = """
+    CREATE TEMP TABLE feed (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        price REAL NOT NULL,
+        image TEXT,
+        category_id INTEGER,
+        category TEXT,
+        stock INTEGER NOT NULL
+    )
+"""
+
+CONTENT_CHANGED = (
+    "products.name IS NOT {new}.name OR products.description IS NOT {new}.description "
+    "OR products.price IS NOT {new}.price OR products.image IS NOT {new}.image "
+    "OR products.category_id IS NOT {new}.category_id"
+)
+
+CATALOG_TRIGGERS = [
+    "products_fts_insert",
+    "products_fts_delete",
+    "products_fts_update",
+    "products_changes_insert",
+    "products_changes_update",
+    "products_changes_stock",
+]
+
+
+class FeedError(ValueError):
+    pass
+
+
+def read_rows(path: str, feed_format: str):
+    with open(path, encoding="utf-8", newline="") as f:
+        if feed_format == "csv":
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+
+
+def _optional(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+# Rândul din fișier, validat, în ordinea coloanelor din tabela feed
+def parse_row(row: dict) -> tuple:
+    try:
+        product_id = int(row["id"])
+        name = str(row["name"]).strip()
+        price = round(float(row["price"]), 2)
+        stock = int(row.get("stock") or 0)
+        category_id = _optional(row.get("category_id"))
+        category_id = int(category_id) if category_id is not None else None
+    except (KeyError, TypeError, ValueError) as e:
+        raise FeedError(f"valoare lipsă sau invalidă: {e}")
+    if not name:
+        raise FeedError("numele produsului lipsește")
+    if price < 0 or stock < 0:
+        raise FeedError("prețul și stocul nu pot fi negative")
+    category = _optional(row.get("category"))
+    if category is None and category_id is None:
+        raise FeedError("lipsește category sau category_id")
+    return (
+        product_id,
+        name,
+        _optional(row.get("description")),
+        price,
+        _optional(row.get("image")),
+        category_id,
+        category,
+        stock,
+    )
+
+
+# Încarcă fișierul în tabela temporară feed, în loturi. Tabela temporară nu blochează
+# baza de date, deci botul poate plasa comenzi în tot acest timp.
+def stage_feed(conn, path: str, feed_format: str) -> dict:
+    conn.execute(FEED_SCHEMA)
+    staged = skipped = 0
+    batch = []
+    for line_number, row in read_rows(path, feed_format):
+        try:
+            batch.append(parse_row(row))
+        except FeedError as e:
+            skipped += 1
+            logger.warning(f"Linia {line_number} ignorată: {e}")
+            continue
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany("INSERT OR REPLACE INTO temp.feed VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            conn.commit()
+            staged += len(batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT OR REPLACE INTO temp.feed VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        conn.commit()
+        staged += len(batch)
+    return {"rows": staged, "skipped": skipped}
+
+
+# Aplică diferențele într-o singură tranzacție scurtă, cu instrucțiuni pe mulțimi de rânduri
+def apply_feed(conn, missing: str = "keep", dry_run: bool = False) -> dict:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        categories = conn.execute(
+            "INSERT INTO categories (name) SELECT DISTINCT category FROM temp.feed "
+            "WHERE category IS NOT NULL AND category NOT IN (SELECT name FROM categories)"
+        ).rowcount
+        conn.execute(
+            "UPDATE temp.feed SET category_id = (SELECT MIN(id) FROM categories WHERE name = feed.category) "
+            "WHERE category IS NOT NULL"
+        )
+        stats = {
+            "categories": categories,
+            "inserted": conn.execute(
+                "SELECT COUNT(*) FROM temp.feed WHERE id NOT IN (SELECT id FROM products)"
+            ).fetchone()[0],
+            "updated": conn.execute(
+                "SELECT COUNT(*) FROM temp.feed JOIN products ON products.id = feed.id "
+                f"WHERE {CONTENT_CHANGED.format(new='feed')}"
+            ).fetchone()[0],
+            "stock": conn.execute(
+                "SELECT COUNT(*) FROM temp.feed JOIN products ON products.id = feed.id "
+                "WHERE products.stock IS NOT feed.stock"
+            ).fetchone()[0],
+        }
+        rebuild = stats["inserted"] + stats["updated"] >= REBUILD_THRESHOLD
+        if rebuild:
+            for trigger in CATALOG_TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.execute("DROP INDEX IF EXISTS idx_products_category")
+
+        # Stocul separat: schimbarea lui nu atinge indexul full-text
+        conn.execute(
+            "UPDATE products SET stock = feed.stock FROM temp.feed "
+            "WHERE products.id = feed.id AND products.stock IS NOT feed.stock"
+        )
+        conn.execute(
+            "INSERT INTO products (id, name, description, price, image, category_id, stock) "
+            "SELECT id, name, description, price, image, category_id, stock FROM temp.feed WHERE true "
+            "ON CONFLICT(id) DO UPDATE SET name = excluded.name, description = excluded.description, "
+            "price = excluded.price, image = excluded.image, category_id = excluded.category_id "
+            f"WHERE {CONTENT_CHANGED.format(new='excluded')}"
+        )
+        # Produsele care nu mai apar în fișier nu sunt șterse (pot exista comenzi pentru ele)
+        stats["missing"] = 0
+        if missing == "zero":
+            stats["missing"] = conn.execute(
+                "UPDATE products SET stock = 0 WHERE stock != 0 AND id NOT IN (SELECT id FROM temp.feed)"
+            ).rowcount
+
+        if rebuild:
+            for statement in CATALOG_SCHEMA:
+                conn.execute(statement)
+            conn.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+            # Triggerele catalog_changes au lipsit și ele: botul reîncarcă tot catalogul
+            conn.execute("UPDATE catalog_changes SET revision = revision + 1")
+        stats["rebuilt"] = rebuild
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        return stats
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def import_catalog(db_path: str, path: str, feed_format: str, missing: str = "keep", dry_run: bool = False) -> dict:
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA foreign_keys=ON")
+        # Simularea nu scrie nimic în fișier: nici WAL, nici schema FTS (statisticile nu depind de ele)
+        if not dry_run:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Indexul și triggerele FTS trebuie să existe înainte de import (baze de date noi)
+            create_catalog_schema(conn)
+        stats = stage_feed(conn, path, feed_format)
+        stats.update(apply_feed(conn, missing, dry_run))
+        if not dry_run:
+            conn.execute("PRAGMA optimize")
+        return stats
+    finally:
+        conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Importă sau sincronizează catalogul de produse")
+    parser.add_argument("path", help="fișier CSV sau JSONL")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "cosmetics.db"))
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="implicit după extensia fișierului")
+    parser.add_argument(
+        "--missing", choices=["keep", "zero"], default="keep",
+        help="produsele care lipsesc din fișier: păstrate ca atare sau cu stocul 0",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="doar raportează diferențele")
+    parser.add_argument("--notify-pid", type=int, help="PID-ul botului, care primește SIGUSR1 după import")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    args = parse_args()
+    feed_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    started = time.perf_counter()
+    try:
+        stats = import_catalog(args.db, args.path, feed_format, args.missing, args.dry_run)
+    except (OSError, json.JSONDecodeError, csv.Error, sqlite3.Error) as e:
+        logger.error(f"Importul a eșuat: {e}")
+        sys.exit(1)
+    logger.info(
+        f"{'Simulare: ' if args.dry_run else ''}{stats['rows']} rânduri citite ({stats['skipped']} ignorate), "
+        f"{stats['inserted']} produse noi, {stats['updated']} modificate, {stats['stock']} cu stoc schimbat, "
+        f"{stats['missing']} fără stoc, {stats['categories']} categorii noi "
+        f"în {time.perf_counter() - started:.2f}s"
+    )
+    if args.notify_pid and not args.dry_run:
+        try:
+            os.kill(args.notify_pid, signal.SIGUSR1)
+        except OSError as e:
+            logger.error(f"Botul (pid {args.notify_pid}) nu a putut fi notificat: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import logging
+import unicodedata
+from collections import OrderedDict
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent
+
+from catalog import search_products
+
+logger = logging.getLogger(__name__)
+
+
+# Aceeași normalizare ca tokenizer-ul FTS5 (unicode61 remove_diacritics 2)
+def normalize_words(text: str) -> list:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch if ch.isalnum() else " " for ch in text if not unicodedata.combining(ch))
+    return text.split()
+
+
+# Căutarea pentru modul inline (@bot text în orice chat). Rezultatele fiecărei interogări
+# sunt păstrate într-un cache LRU până la următoarea reîncărcare a catalogului. Când
+# utilizatorul continuă să tasteze, rezultatele complete ale unui prefix deja căutat sunt
+# filtrate în memorie, fără o nouă interogare FTS.
+class InlineSearch:
+    def __init__(self, catalog, db, recommender=None, limit: int = 20, cache_size: int = 1024):
+        self.catalog = catalog
+        self.db = db
+        self.recommender = recommender
+        self.limit = limit
+        self.cache_size = cache_size
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+        self._version = None
+        self._results = OrderedDict()
+        self._tokens = {}
+        self._articles = {}
+
+    def _check_version(self):
+        if self._version != self.catalog.version:
+            self._results.clear()
+            self._tokens.clear()
+            self._articles.clear()
+            self._version = self.catalog.version
+
+    def _remember(self, key: str, ids: list):
+        self._results[key] = ids
+        self._results.move_to_end(key)
+        if len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+
+    def _product_tokens(self, product: dict) -> list:
+        tokens = self._tokens.get(product["id"])
+        if tokens is None:
+            tokens = normalize_words(f"{product['name']} {product.get('description') or ''}")
+            self._tokens[product["id"]] = tokens
+        return tokens
+
+    # Rezultatele unui prefix al interogării, dacă au fost complete (sub limită)
+    def _from_prefix(self, key: str, words: list):
+        for end in range(len(key) - 1, 0, -1):
+            ids = self._results.get(key[:end])
+            if ids is None or len(ids) >= self.limit:
+                continue
+            products = self.catalog.products(ids)
+            return [
+                product_id for product_id in ids
+                if product_id in products
+                and all(any(token.startswith(word) for token in self._product_tokens(products[product_id])) for word in words)
+            ]
+        return None
+
+    # Id-urile produselor găsite, în ordinea relevanței
+    async def search(self, text: str) -> list:
+        self._check_version()
+        words = normalize_words(text)
+        if not words:
+            return self.recommender.best_sellers()[:self.limit] if self.recommender else []
+        key = " ".join(words)
+        ids = self._results.get(key)
+        if ids is not None:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return ids
+        ids = self._from_prefix(key, words)
+        if ids is not None:
+            self.prefix_hits += 1
+        else:
+            self.misses += 1
+            ids = await self.db.run(search_products, key, self.limit)
+        self._remember(key, ids)
+        return ids
+
+    def _article(self, product: dict) -> InlineQueryResultArticle:
+        # Stocul se actualizează fără reîncărcarea catalogului, deci face parte din cheie
+        key = (product["id"], product["stock"] > 0)
+        article = self._articles.get(key)
+        if article is None:
+            text = f"{product['name']}\nPreț: {product['price']} RON\n{product.get('description') or ''}".strip()
+            article = InlineQueryResultArticle(
+                id=str(product["id"]),
+                title=product["name"],
+                description=f"{product['price']} RON" + ("" if product["stock"] > 0 else " · stoc epuizat"),
+                input_message_content=InputTextMessageContent(text),
+                thumbnail_url=product.get("image") or None,
+            )
+            self._articles[key] = article
+        return article
+
+    async def results(self, text: str) -> list:
+        ids = await self.search(text)
+        products = self.catalog.products(ids)
+        return [self._article(products[product_id]) for product_id in ids if product_id in products]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "prefix_hits": self.prefix_hits,
+            "misses": self.misses,
+            "cached": len(self._results),
+        }
@@ -0,0 +1,109 @@
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Tastaturile fixe sunt construite o singură dată; InlineKeyboardMarkup este imutabil,
+# deci aceleași obiecte pot fi refolosite în toate răspunsurile.
+MAIN_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🛍️ Produse", callback_data="products")],
+    [InlineKeyboardButton("🔥 Promoții", callback_data="promotions")],
+    [InlineKeyboardButton("📞 Contact", callback_data="contact")],
+    [InlineKeyboardButton("🛒 Coșul meu", callback_data="cart")],
+])
+
+BACK_TO_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")],
+])
+
+CART = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Finalizează comanda", callback_data="checkout")],
+    [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")],
+])
+
+AFTER_ADD_TO_CART = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Vezi coșul", callback_data="cart")],
+    [InlineKeyboardButton("Înapoi la categorie", callback_data="back_to_products")],
+    [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")],
+])
+
+CONFIRM_ORDER_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Confirmă comanda", callback_data="confirm_order")],
+    [InlineKeyboardButton("Anulează", callback_data="cancel_order")],
+    [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")],
+])
+
+
+# Tastaturile care depind de catalog (categorii, produse) sunt construite la prima
+# cerere și păstrate până când catalogul se reîncarcă (catalog.version se schimbă).
+class KeyboardCache:
+    def __init__(self, catalog, page_size: int = 8):
+        self.catalog = catalog
+        self.page_size = page_size
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._markups = {}
+
+    def _get(self, key, build):
+        if self._version != self.catalog.version:
+            self._markups.clear()
+            self._version = self.catalog.version
+        markup = self._markups.get(key)
+        if markup is None:
+            self.misses += 1
+            markup = build()
+            self._markups[key] = markup
+        else:
+            self.hits += 1
+        return markup
+
+    def categories(self) -> InlineKeyboardMarkup:
+        def build():
+            keyboard = [
+                [InlineKeyboardButton(category.title(), callback_data=f"category_{category}")]
+                for category in self.catalog.categories()
+            ]
+            keyboard.append([InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")])
+            return InlineKeyboardMarkup(keyboard)
+        return self._get("categories", build)
+
+    # O pagină din lista de produse a unei categorii, cu butoane de navigare între pagini
+    def category_products(self, category: str, page: int = 0) -> InlineKeyboardMarkup:
+        def build():
+            products, pages = self.catalog.products_page(category, page, self.page_size)
+            keyboard = [
+                [InlineKeyboardButton(product["name"], callback_data=f"product_{product['id']}")]
+                for product in products
+            ]
+            navigation = []
+            if page > 0:
+                navigation.append(InlineKeyboardButton("⬅️ Înapoi", callback_data=f"page_{page - 1}_{category}"))
+            if page < pages - 1:
+                navigation.append(InlineKeyboardButton("Înainte ➡️", callback_data=f"page_{page + 1}_{category}"))
+            if navigation:
+                keyboard.append(navigation)
+            keyboard.append([InlineKeyboardButton("Înapoi la categorii", callback_data="back_to_products")])
+            keyboard.append([InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")])
+            return InlineKeyboardMarkup(keyboard)
+        return self._get(("category", category, page), build)
+
+    # Rezultatele unei căutări (nu sunt păstrate în cache)
+    def search_results(self, product_ids: list) -> InlineKeyboardMarkup:
+        products = self.catalog.products(product_ids)
+        keyboard = [
+            [InlineKeyboardButton(products[product_id]["name"], callback_data=f"product_{product_id}")]
+            for product_id in product_ids
+            if product_id in products
+        ]
+        keyboard.append([InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")])
+        return InlineKeyboardMarkup(keyboard)
+
+    def product_actions(self, product_id: int) -> InlineKeyboardMarkup:
+        def build():
+            return InlineKeyboardMarkup([
+                [InlineKeyboardButton("Adaugă în coș", callback_data=f"add_to_cart_{product_id}")],
+                [InlineKeyboardButton("Înapoi la categorie", callback_data="back_to_products")],
+                [InlineKeyboardButton("Înapoi la meniu", callback_data="back_to_menu")],
+            ])
+        return self._get(("product", product_id), build)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._markups)}
@@ -0,0 +1,189 @@
+import asyncio
+import functools
+import json
+import logging
+import time
+from bisect import bisect_left
+from http import HTTPStatus
+
+logger = logging.getLogger(__name__)
+
+# Limitele (în secunde) ale histogramelor de durată
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # Ultima poziție numără valorile peste cea mai mare limită (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    # Limita superioară a bucket-ului în care cade percentila p (aproximare)
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+# Registru de metrici în memorie: histograme de durată, contoare și statisticile
+# expuse de cache-uri și cozi (colectori). Toate actualizările se fac din bucla de
+# evenimente, deci nu e nevoie de lock-uri.
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = {}
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    # fn() întoarce un dict cu valori numerice, exportate ca bot_<prefix>_<cheie>
+    def add_collector(self, prefix: str, fn):
+        self._collectors[prefix] = fn
+
+    def _collected(self) -> dict:
+        values = {}
+        for prefix, fn in self._collectors.items():
+            try:
+                stats = fn()
+            except Exception as e:
+                logger.error(f"Eroare la colectarea metricilor {prefix}: {e}")
+                continue
+            for name, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values[f"bot_{prefix}_{name}"] = value
+        return values
+
+    # Format text Prometheus (version 0.0.4)
+    def render(self) -> str:
+        lines = []
+        declared = set()
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{name}_sum{_label_text(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_label_text(labels)} {histogram.count}")
+        for (name, labels), value in sorted(self._counters.items()):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for name, value in sorted(self._collected().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Rezumat compact pentru log: număr, medie și p95 (în ms) pe fiecare histogramă
+    def snapshot(self) -> dict:
+        timings = {}
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            key = name + _label_text(labels)
+            timings[key] = {
+                "count": histogram.count,
+                "avg_ms": round(histogram.sum / histogram.count * 1000, 2) if histogram.count else 0.0,
+                "p95_ms": round(histogram.percentile(95) * 1000, 2),
+            }
+        counters = {name + _label_text(labels): value for (name, labels), value in sorted(self._counters.items())}
+        return {"timings": timings, "counters": counters, "gauges": self._collected()}
+
+    # Răspunsul pentru GET /metrics, servit de start_metrics_server
+    async def handle_request(self, headers: dict, body: bytes):
+        return HTTPStatus.OK, self.render().encode(), {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    async def log_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            logger.info(f"Metrici: {json.dumps(self.snapshot(), ensure_ascii=False)}")
+
+
+# Înlocuiește callback-ul unui handler cu unul care îi măsoară durata și erorile
+def timed_callback(callback, metrics: Metrics):
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            metrics.inc("bot_handler_errors_total", handler=name)
+            raise
+        finally:
+            metrics.observe("bot_handler_duration_seconds", time.perf_counter() - started, handler=name)
+
+    return wrapper
+
+
+# Instrumentează toate handler-ele unui ConversationHandler (entry points, stări, fallbacks).
+# Se apelează doar când metricile sunt activate, deci altfel nu există niciun cost.
+def instrument_conversation(conv_handler, metrics: Metrics):
+    handlers = list(conv_handler.entry_points) + list(conv_handler.fallbacks)
+    for state_handlers in conv_handler.states.values():
+        handlers.extend(state_handlers)
+    wrapped = {}
+    for handler in handlers:
+        callback = handler.callback
+        if callback not in wrapped:
+            wrapped[callback] = timed_callback(callback, metrics)
+        handler.callback = wrapped[callback]
+
+
+# Server HTTP separat pentru /metrics, pe METRICS_LISTEN (implicit 127.0.0.1), în orice mod;
+# metricile nu se expun pe serverul webhook, care este public
+async def start_metrics_server(metrics: Metrics, host: str, port: int, path: str = "/metrics"):
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split(" ")
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?", 1)[0] == path:
+                status, payload, headers = await metrics.handle_request({}, b"")
+            else:
+                status, payload, headers = HTTPStatus.NOT_FOUND, b"", {}
+            lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Length: {len(payload)}", "Connection: close"]
+            lines += [f"{name}: {value}" for name, value in headers.items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Metrici disponibile pe {host}:{port}{path}")
+    return server
@@ -0,0 +1,111 @@
+import logging
+from collections import OrderedDict
+
+from telegram import InputMediaPhoto, Message
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+# Afișează pașii de navigare. În modul „reply” fiecare clic trimite un mesaj nou (comportamentul
+# clasic). În modul „edit” mesajul pe care s-a apăsat este editat: text → text prin
+# edit_message_text / edit_message_reply_markup, poză → poză prin edit_message_media /
+# edit_message_caption. Dacă nimic nu s-a schimbat, nu se face niciun apel. Când tipul
+# mesajului nu se potrivește (text ↔ poză) sau editarea nu mai e posibilă, se trimite un mesaj nou.
+class Navigator:
+    def __init__(self, photo_cache, edit: bool = False, max_tracked: int = 10000):
+        self.photo_cache = photo_cache
+        self.edit = edit
+        self.max_tracked = max_tracked
+        self.edits = 0
+        self.skipped = 0
+        self.replies = 0
+        # Ce a afișat botul ultima dată în fiecare mesaj: (chat_id, message_id) -> semnătură
+        self._shown = OrderedDict()
+
+    def _remember(self, message, signature: tuple):
+        if not isinstance(message, Message):
+            return
+        key = (message.chat_id, message.message_id)
+        self._shown[key] = signature
+        self._shown.move_to_end(key)
+        if len(self._shown) > self.max_tracked:
+            self._shown.popitem(last=False)
+
+    def _last_shown(self, message):
+        return self._shown.get((message.chat_id, message.message_id))
+
+    async def _reply_text(self, query, text: str, reply_markup, parse_mode):
+        self.replies += 1
+        sent = await query.message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        if self.edit:
+            self._remember(sent, ("text", text, parse_mode, reply_markup))
+        return sent
+
+    async def _reply_photo(self, query, product: dict, caption: str, reply_markup, parse_mode):
+        self.replies += 1
+        sent = await self.photo_cache.reply_photo(
+            query.message, product, caption=caption, parse_mode=parse_mode, reply_markup=reply_markup
+        )
+        if self.edit:
+            self._remember(sent, ("photo", product["id"], product["image"], caption, parse_mode, reply_markup))
+        return sent
+
+    async def show_text(self, query, text: str, reply_markup=None, parse_mode=None):
+        message = query.message
+        if not self.edit or message is None or message.text is None:
+            return await self._reply_text(query, text, reply_markup, parse_mode)
+        signature = ("text", text, parse_mode, reply_markup)
+        last = self._last_shown(message)
+        if last is None and parse_mode is None and message.text == text and message.reply_markup == reply_markup:
+            last = signature
+        try:
+            if last == signature:
+                self.skipped += 1
+                return message
+            if last is not None and last[:3] == signature[:3]:
+                sent = await query.edit_message_reply_markup(reply_markup=reply_markup)
+            else:
+                sent = await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                self.skipped += 1
+                self._remember(message, signature)
+                return message
+            logger.warning(f"Mesajul {message.message_id} nu poate fi editat: {e}")
+            return await self._reply_text(query, text, reply_markup, parse_mode)
+        self.edits += 1
+        self._remember(message, signature)
+        return sent
+
+    async def show_photo(self, query, product: dict, caption: str, reply_markup=None, parse_mode=None):
+        message = query.message
+        if not self.edit or message is None or not message.photo:
+            return await self._reply_photo(query, product, caption, reply_markup, parse_mode)
+        signature = ("photo", product["id"], product["image"], caption, parse_mode, reply_markup)
+        last = self._last_shown(message)
+        try:
+            if last == signature:
+                self.skipped += 1
+                return message
+            if last is not None and last[:3] == signature[:3]:
+                sent = await query.edit_message_caption(caption=caption, reply_markup=reply_markup, parse_mode=parse_mode)
+            else:
+                media = InputMediaPhoto(
+                    self.photo_cache.file_id(product) or product["image"], caption=caption, parse_mode=parse_mode
+                )
+                sent = await query.edit_message_media(media, reply_markup=reply_markup)
+                await self.photo_cache.remember(product, sent if isinstance(sent, Message) else None)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                self.skipped += 1
+                self._remember(message, signature)
+                return message
+            logger.warning(f"Poza din mesajul {message.message_id} nu poate fi editată: {e}")
+            return await self._reply_photo(query, product, caption, reply_markup, parse_mode)
+        self.edits += 1
+        self._remember(message, signature)
+        return sent
+
+    def stats(self) -> dict:
+        return {"edits": self.edits, "skipped": self.skipped, "replies": self.replies, "tracked": len(self._shown)}
@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+
+from telegram.error import BadRequest
+
+from recommendations import record_sales
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+ORDERS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS orders (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER,
+        name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        address TEXT NOT NULL,
+        email TEXT,
+        total REAL NOT NULL,
+        created_at TEXT NOT NULL,
+        notified_at TEXT,
+        notify_owner TEXT,
+        notify_lease_until REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS order_items (
+        order_id TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        price REAL NOT NULL,
+        subtotal REAL NOT NULL,
+        PRIMARY KEY (order_id, product_id),
+        FOREIGN KEY (order_id) REFERENCES orders(id),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_orders_pending ON orders(notified_at) WHERE notified_at IS NULL",
+]
+
+
+class OutOfStockError(Exception):
+    def __init__(self, products: list):
+        super().__init__(f"Stoc insuficient pentru: {', '.join(products)}")
+        self.products = products
+
+
+# Coloanele adăugate după prima versiune a tabelei orders (baze de date existente)
+ORDERS_COLUMNS = {
+    "notify_owner": "TEXT",
+    "notify_lease_until": "REAL",
+}
+
+
+def create_orders_schema(conn):
+    with conn:
+        for statement in ORDERS_SCHEMA:
+            conn.execute(statement)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(orders)")}
+        for column, column_type in ORDERS_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE orders ADD COLUMN {column} {column_type}")
+
+
+# Salvează comanda și rezervă stocul pentru tot coșul într-o singură tranzacție.
+# Dacă un produs nu are stoc suficient, nimic nu se modifică și se ridică OutOfStockError.
+def place_order(conn, order: dict, priced_cart: dict, lease: tuple = (None, None)):
+    lines = priced_cart["lines"]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        reserved = conn.executemany(
+            "UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?",
+            [(line["quantity"], line["product"]["id"], line["quantity"]) for line in lines],
+        ).rowcount
+        if reserved != len(lines):
+            conn.rollback()
+            placeholders = ",".join("?" for _ in lines)
+            stock = dict(conn.execute(
+                f"SELECT id, stock FROM products WHERE id IN ({placeholders})",
+                [line["product"]["id"] for line in lines],
+            ).fetchall())
+            raise OutOfStockError([
+                line["product"]["name"] for line in lines
+                if stock.get(line["product"]["id"], 0) < line["quantity"]
+            ])
+        conn.execute(
+            "INSERT INTO orders (id, user_id, name, phone, address, email, total, created_at, "
+            "notify_owner, notify_lease_until) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                order["id"], order.get("user_id"), order["name"], order["phone"],
+                order["address"], order.get("email", ""), priced_cart["total"], order["created_at"],
+                *lease,
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, name, quantity, price, subtotal) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (order["id"], line["product"]["id"], line["product"]["name"],
+                 line["quantity"], line["product"]["price"], line["subtotal"])
+                for line in lines
+            ],
+        )
+        record_sales(conn, [(line["product"]["id"], line["quantity"]) for line in lines])
+        conn.commit()
+    except BaseException:
+        # Orice eroare (și anularea) lasă conexiunea fără tranzacție deschisă
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def mark_notified(conn, order_ids: list):
+    notified_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with conn:
+        conn.executemany(
+            "UPDATE orders SET notified_at = ? WHERE id = ?",
+            [(notified_at, order_id) for order_id in order_ids],
+        )
+
+
+# Prelungește lease-ul comenzilor nenotificate ale procesului owner
+def renew_notify_leases(conn, owner: str, lease_until: float) -> int:
+    with conn:
+        return conn.execute(
+            "UPDATE orders SET notify_lease_until = ? WHERE notified_at IS NULL AND notify_owner = ?",
+            (lease_until, owner),
+        ).rowcount
+
+
+# Preia comenzile nenotificate fără lease valabil (procesul care le-a plasat s-a oprit);
+# UPDATE-ul e atomic, deci o comandă e preluată de un singur proces
+def claim_unnotified(conn, owner: str, lease_until: float, now: float) -> list:
+    with conn:
+        rows = conn.execute(
+            "UPDATE orders SET notify_owner = ?, notify_lease_until = ? "
+            "WHERE notified_at IS NULL AND (notify_lease_until IS NULL OR notify_lease_until < ?) "
+            "RETURNING id, created_at",
+            (owner, lease_until, now),
+        ).fetchall()
+    return [row["id"] for row in sorted(rows, key=lambda row: row["created_at"])]
+
+
+# Textul pentru admin, reconstruit din baza de date (folosit la recuperarea notificărilor)
+def load_order_message(conn, order_id: str) -> str:
+    order = conn.execute("SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone()
+    items = conn.execute("SELECT * FROM order_items WHERE order_id = ?", (order_id,)).fetchall()
+    lines = [
+        {"product": {"name": item["name"]}, "quantity": item["quantity"], "subtotal": item["subtotal"]}
+        for item in items
+    ]
+    return format_admin_message(dict(order), {"lines": lines, "total": order["total"]})
+
+
+def format_admin_message(order: dict, priced_cart: dict) -> str:
+    message = f"📦 **Comandă nouă (ID: {order['id']})** ({order['created_at']}):\n"
+    message += "".join(
+        f"{line['product']['name']} x{line['quantity']}: {line['subtotal']} RON\n"
+        for line in priced_cart["lines"]
+    )
+    message += f"\n**Total**: {priced_cart['total']} RON\n"
+    message += (
+        f"\n**Detalii client**:\n"
+        f"Nume: {order['name']}\n"
+        f"Telefon: {order['phone']}\n"
+        f"Adresă: {order['address']}\n"
+        f"Email: {order.get('email') or 'Nefurnizat'}"
+    )
+    return message
+
+
+# Notificarea adminului se face în fundal, în afara handler-ului: clientul primește
+# confirmarea imediat după salvarea comenzii. Fiecare comandă nenotificată (notified_at NULL)
+# aparține procesului care o notifică (notify_owner) cât timp acesta îi prelungește lease-ul;
+# comenzile cu lease expirat (proces oprit sau repornit) sunt preluate de oricare proces.
+class OrderPipeline:
+    def __init__(self, db, retry_delay: float = 5.0, max_retry_delay: float = 300.0, rate_limit_args=None,
+                 lease_time: float = 30.0):
+        self.db = db
+        self.rate_limit_args = rate_limit_args
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lease_time = lease_time
+        self.owner = uuid.uuid4().hex
+        self.queue = asyncio.Queue()
+        self._queued = set()
+        self._carry = None
+        self.notified = 0
+        self.failures = 0
+
+    def submit(self, order_id: str, message: str):
+        if order_id in self._queued:
+            return
+        self._queued.add(order_id)
+        self.queue.put_nowait((order_id, message))
+
+    # (owner, lease_until) pentru o comandă nouă, salvat odată cu ea de place_order
+    def lease(self) -> tuple:
+        return self.owner, time.time() + self.lease_time
+
+    async def recover(self):
+        order_ids = await self.db.run(claim_unnotified, self.owner, time.time() + self.lease_time, time.time())
+        for order_id in order_ids:
+            message = await self.db.run(load_order_message, order_id)
+            self.submit(order_id, message)
+        if order_ids:
+            logger.info(f"{len(order_ids)} comenzi nenotificate au fost reluate")
+
+    # Prelungește lease-urile proprii (și pe cele ale comenzilor care nu au putut fi trimise,
+    # reîncercate abia de următorul proces care le preia) și preia comenzile rămase fără
+    # proces; prima trecere (la pornire) reia comenzile lăsate de o rulare anterioară
+    async def keep_leases(self):
+        while True:
+            try:
+                await self.db.run(renew_notify_leases, self.owner, time.time() + self.lease_time)
+                await self.recover()
+            except Exception as e:
+                logger.error(f"Eroare la reluarea comenzilor nenotificate: {e}")
+            await asyncio.sleep(self.lease_time / 3)
+
+    async def _notify(self, bot, admin_chat_id: int, order_ids: list, message: str):
+        delay = self.retry_delay
+        parse_mode = "Markdown"
+        kwargs = {"rate_limit_args": self.rate_limit_args} if self.rate_limit_args else {}
+        while True:
+            try:
+                await bot.send_message(chat_id=admin_chat_id, text=message, parse_mode=parse_mode, **kwargs)
+                break
+            except BadRequest as e:
+                if parse_mode is None:
+                    logger.error(f"Comenzile {', '.join(order_ids)} nu pot fi trimise adminului: {e}")
+                    return
+                # Datele clientului pot strica formatarea Markdown; retrimitem ca text simplu
+                parse_mode = None
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Eroare la trimiterea comenzilor {', '.join(order_ids)} către admin: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+        # Mesajul a plecat: doar marcarea se reîncearcă (de exemplu „database is locked” cât
+        # timp un import ține baza de date), altfel adminul ar primi comanda de două ori
+        delay = self.retry_delay
+        while True:
+            try:
+                await self.db.run(mark_notified, order_ids)
+                break
+            except sqlite3.Error as e:
+                self.failures += 1
+                logger.error(f"Comenzile {', '.join(order_ids)} nu au putut fi marcate ca notificate: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+        self.notified += len(order_ids)
+
+    # Comenzile deja aflate în coadă sunt unite într-un singur mesaj (în limita Telegram)
+    def _coalesce(self, first: tuple) -> tuple:
+        order_ids, messages = [first[0]], [first[1]]
+        length = len(first[1])
+        while not self.queue.empty():
+            order_id, message = self.queue.get_nowait()
+            if length + len(message) + 2 > MAX_MESSAGE_LENGTH:
+                self._carry = (order_id, message)
+                break
+            order_ids.append(order_id)
+            messages.append(message)
+            length += len(message) + 2
+        return order_ids, "\n\n".join(messages)
+
+    async def run(self, bot, admin_chat_id: int):
+        failed = None
+        while True:
+            if failed is not None:
+                (order_ids, message), failed = failed, None
+            else:
+                if self._carry is not None:
+                    first, self._carry = self._carry, None
+                else:
+                    first = await self.queue.get()
+                order_ids, message = self._coalesce(first)
+            try:
+                await self._notify(bot, admin_chat_id, order_ids, message)
+            except Exception as e:
+                # Bucla trebuie să supraviețuiască: cât timp procesul trăiește, keep_leases
+                # păstrează comenzile lui și niciun alt proces nu le-ar mai prelua. Lotul
+                # se reîncearcă după o pauză.
+                logger.error(f"Eroare neașteptată la notificarea comenzilor {', '.join(order_ids)}: {e}")
+                failed = (order_ids, message)
+                await asyncio.sleep(self.retry_delay)
+                continue
+            self._queued.difference_update(order_ids)
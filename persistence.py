@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+STATE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS user_data (
+        user_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conversations (
+        name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        state TEXT NOT NULL,
+        PRIMARY KEY (name, key)
+    )
+    """,
+]
+
+
+def _create_schema(conn):
+    # Conexiunea a inițializat deja fișierul în mod WAL, așa că auto_vacuum setat acum
+    # nu are efect până la un VACUUM; acesta rulează o singură dată (fișier nou sau vechi)
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        logger.info("auto_vacuum=INCREMENTAL activat pentru baza de date a stării")
+    with conn:
+        for statement in STATE_SCHEMA:
+            conn.execute(statement)
+
+
+# Persistența stării utilizatorilor (coș, date de comandă, starea conversației) într-un
+# fișier SQLite separat. Scrierile sunt adunate în memorie și scrise în loturi
+# (write-behind), datele unui utilizator se încarcă abia la primul lui update,
+# iar fișierul este compactat periodic.
+class SQLitePersistence(BasePersistence):
+    def __init__(self, path: str, update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.db = Database(path, pool_size=1)
+        self._schema_ready = False
+        self._loaded_users = set()
+        self._dirty_users = {}
+        self._dropped_users = set()
+        self._dirty_conversations = {}
+        self._flush_task = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    async def _ensure_schema(self):
+        if not self._schema_ready:
+            await self.db.run(_create_schema)
+            self._schema_ready = True
+
+    # Datele utilizatorilor se încarcă leneș, în refresh_user_data
+    async def get_user_data(self) -> dict:
+        await self._ensure_schema()
+        return {}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        await self._ensure_schema()
+        rows = await self.db.fetchall("SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(row["key"])): json.loads(row["state"]) for row in rows}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id in self._loaded_users:
+            return
+        self._loaded_users.add(user_id)
+        row = await self.db.fetchone("SELECT data FROM user_data WHERE user_id = ?", (user_id,))
+        if row:
+            stored = json.loads(row["data"])
+            # Ce s-a scris deja în user_data în acest proces are prioritate
+            for key, value in stored.items():
+                user_data.setdefault(key, value)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._dropped_users.discard(user_id)
+        self._dirty_users[user_id] = json.dumps(data, ensure_ascii=False)
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._dirty_users.pop(user_id, None)
+        self._dropped_users.add(user_id)
+        self._schedule_flush()
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        self._dirty_conversations[(name, json.dumps(list(key)))] = new_state
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    # Application apelează update_* pentru toți utilizatorii modificați în aceeași rundă;
+    # le lăsăm să se adune și le scriem într-o singură tranzacție
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(0)
+        await self._write_pending()
+
+    async def _write_pending(self):
+        users, self._dirty_users = self._dirty_users, {}
+        dropped, self._dropped_users = self._dropped_users, set()
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        if not users and not dropped and not conversations:
+            return
+        now = time.time()
+        user_rows = [(user_id, data, now) for user_id, data in users.items()]
+        state_rows = [(name, key, json.dumps(state)) for (name, key), state in conversations.items() if state is not None]
+        ended = [(name, key) for (name, key), state in conversations.items() if state is None]
+
+        def _write(conn):
+            with conn:
+                conn.executemany(
+                    "INSERT INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    user_rows,
+                )
+                conn.executemany("DELETE FROM user_data WHERE user_id = ?", [(user_id,) for user_id in dropped])
+                conn.executemany(
+                    "INSERT INTO conversations (name, key, state) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name, key) DO UPDATE SET state = excluded.state",
+                    state_rows,
+                )
+                conn.executemany("DELETE FROM conversations WHERE name = ? AND key = ?", ended)
+
+        await self.db.run(_write)
+        self.flushes += 1
+        self.rows_written += len(user_rows) + len(dropped) + len(state_rows) + len(ended)
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._write_pending()
+
+    # Șterge datele utilizatorilor fără coș și fără comandă începută (restul, de exemplu
+    # categoria și pagina curentă, nu merită păstrat), readuce spațiul liber și trunchiază
+    # jurnalul WAL
+    async def compact(self):
+        def _compact(conn):
+            with conn:
+                deleted = conn.execute(
+                    "DELETE FROM user_data WHERE json_valid(data) "
+                    "AND coalesce(json_extract(data, '$.cart'), '{}') = '{}' "
+                    "AND coalesce(json_extract(data, '$.order'), '{}') = '{}'"
+                ).rowcount
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return deleted
+
+        deleted = await self.db.run(_compact)
+        logger.info(f"Persistență compactată: {deleted} înregistrări goale șterse")
+
+    def close(self):
+        self.db.close()
+
+
+# Compactare periodică a fișierului de stare
+async def compact_periodically(persistence: SQLitePersistence, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await persistence.compact()
+        except Exception as e:
+            logger.error(f"Eroare la compactarea persistenței: {e}")
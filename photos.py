@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+PHOTOS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS product_photos (
+        product_id INTEGER PRIMARY KEY,
+        image_url TEXT NOT NULL,
+        file_id TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    )
+    """,
+]
+
+
+def create_photos_schema(conn):
+    with conn:
+        for statement in PHOTOS_SCHEMA:
+            conn.execute(statement)
+
+
+# Cache pentru file_id-urile Telegram ale pozelor de produs. După prima trimitere a unei
+# poze, Telegram o are deja: retrimiterea prin file_id evită descărcarea și procesarea
+# imaginii de la URL. Un file_id este valabil doar cât timp URL-ul produsului rămâne același.
+class PhotoCache:
+    def __init__(self, db):
+        self.db = db
+        self.hits = 0
+        self.misses = 0
+        self._by_product = {}
+        self._by_url = {}
+
+    async def load(self):
+        rows = await self.db.fetchall("SELECT product_id, image_url, file_id FROM product_photos")
+        for row in rows:
+            self._by_product[row["product_id"]] = (row["image_url"], row["file_id"])
+            self._by_url[row["image_url"]] = row["file_id"]
+        logger.info(f"{len(rows)} file_id-uri de poze încărcate")
+
+    # file_id-ul pozei produsului sau None dacă nu există ori URL-ul s-a schimbat
+    def file_id(self, product: dict):
+        cached = self._by_product.get(product["id"])
+        if cached and cached[0] == product["image"]:
+            return cached[1]
+        # Aceeași imagine poate fi folosită de mai multe produse
+        return self._by_url.get(product["image"])
+
+    async def remember(self, product: dict, message):
+        if not message or not message.photo:
+            return
+        file_id = message.photo[-1].file_id
+        if self._by_product.get(product["id"]) == (product["image"], file_id):
+            return
+        self._by_product[product["id"]] = (product["image"], file_id)
+        self._by_url[product["image"]] = file_id
+        await self.db.execute(
+            "INSERT INTO product_photos (product_id, image_url, file_id, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(product_id) DO UPDATE SET image_url = excluded.image_url, "
+            "file_id = excluded.file_id, updated_at = excluded.updated_at",
+            (product["id"], product["image"], file_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+        )
+
+    def forget(self, product: dict):
+        cached = self._by_product.pop(product["id"], None)
+        if cached:
+            self._by_url.pop(cached[0], None)
+        self._by_url.pop(product["image"], None)
+
+    # Trimite poza produsului ca răspuns: prin file_id dacă îl avem, altfel prin URL
+    async def reply_photo(self, message, product: dict, **kwargs):
+        file_id = self.file_id(product)
+        if file_id:
+            try:
+                self.hits += 1
+                return await message.reply_photo(photo=file_id, **kwargs)
+            except BadRequest as e:
+                logger.warning(f"file_id invalid pentru produsul {product['id']}: {e}")
+                self.forget(product)
+        self.misses += 1
+        sent = await message.reply_photo(photo=product["image"], **kwargs)
+        await self.remember(product, sent)
+        return sent
+
+    # Încarcă în avans pozele care nu au file_id, trimițându-le într-un chat de serviciu
+    async def prewarm(self, bot, chat_id: int, products: list, delay: float = 1.0):
+        warmed = 0
+        for product in products:
+            if not product.get("image") or self.file_id(product):
+                continue
+            try:
+                sent = await bot.send_photo(chat_id=chat_id, photo=product["image"], disable_notification=True)
+                await self.remember(product, sent)
+                await bot.delete_message(chat_id=chat_id, message_id=sent.message_id)
+                warmed += 1
+            except Exception as e:
+                logger.error(f"Eroare la preîncărcarea pozei produsului {product['id']}: {e}")
+            await asyncio.sleep(delay)
+        logger.info(f"{warmed} poze preîncărcate")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._by_product)}
@@ -0,0 +1,189 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+# Apeluri care nu trimit mesaje și nu intră sub limitele de flood
+UNLIMITED_ENDPOINTS = {
+    "answerCallbackQuery",
+    "answerInlineQuery",
+    "getMe",
+    "getUpdates",
+    "setWebhook",
+    "deleteWebhook",
+    "getWebhookInfo",
+    "logOut",
+    "close",
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Câte secunde mai sunt până la următorul token disponibil
+    def wait_time(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+# Limitator pentru apelurile către Bot API: un token bucket global și câte unul pe chat,
+# ordine după prioritate (notificările de comenzi trec primele) și reîncercare după
+# RetryAfter, timp în care toate trimiterile sunt oprite.
+class OutboundRateLimiter(BaseRateLimiter):
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        group_rate: float = 20 / 60,
+        max_retries: int = 3,
+        max_tracked_chats: int = 10000,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_tracked_chats = max_tracked_chats
+        self.retries = 0
+        self.throttled = 0
+        self._chat_buckets = {}
+        self._chat_locks = {}
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._dispatcher = None
+        self._paused_until = 0.0
+        # metrics.Metrics, setat doar când metricile sunt activate
+        self.metrics = None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+
+    # Bucket-urile chat-urilor inactive (pline și fără cereri în așteptare) sunt eliminate
+    def _prune_chat_buckets(self):
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            if bucket.wait_time() == 0 and bucket.tokens >= bucket.burst and not self._chat_locks[chat_id].locked():
+                del self._chat_buckets[chat_id]
+                del self._chat_locks[chat_id]
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_tracked_chats:
+                self._prune_chat_buckets()
+            # Grupurile (id negativ sau @username) au o limită mult mai mică
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = TokenBucket(rate, 1 if is_group else self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+            self._chat_locks[chat_id] = asyncio.Lock()
+        return bucket
+
+    async def _acquire_chat(self, chat_id):
+        bucket = self._chat_bucket(chat_id)
+        async with self._chat_locks[chat_id]:
+            wait = bucket.wait_time()
+            if wait > 0:
+                self.throttled += 1
+                await asyncio.sleep(wait)
+                bucket.wait_time()
+            bucket.take()
+
+    async def _acquire_global(self, priority: int):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    # Eliberează cererile în ordinea priorității, cât permite bucket-ul global
+    async def _dispatch(self):
+        while self._waiters:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            wait = self.global_bucket.wait_time()
+            if wait > 0:
+                self.throttled += 1
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.global_bucket.take()
+                future.set_result(None)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return await self._call(callback, args, kwargs, endpoint)
+
+        priority = PRIORITY_NORMAL
+        if isinstance(rate_limit_args, dict):
+            priority = rate_limit_args.get("priority", PRIORITY_NORMAL)
+        chat_id = data.get("chat_id")
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None:
+                await self._acquire_chat(chat_id)
+            await self._acquire_global(priority)
+            try:
+                return await self._call(callback, args, kwargs, endpoint)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Limita Telegram atinsă după {self.max_retries} reîncercări ({endpoint})")
+                    raise
+                self.retries += 1
+                retry_after = float(e.retry_after) + 0.1
+                logger.warning(f"Limita Telegram atinsă ({endpoint}); reîncercăm peste {retry_after:.1f}s")
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                await asyncio.sleep(retry_after)
+
+    # Apelul propriu-zis către Bot API, cronometrat dacă metricile sunt activate
+    async def _call(self, callback, args, kwargs, endpoint):
+        if self.metrics is None:
+            return await callback(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except RetryAfter:
+            self.metrics.inc("bot_api_flood_errors_total", endpoint=endpoint)
+            raise
+        finally:
+            self.metrics.observe("bot_api_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "waiting": len(self._waiters),
+            "chats": len(self._chat_buckets),
+        }
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from itertools import permutations
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS product_sales (
+        product_id INTEGER PRIMARY KEY,
+        quantity INTEGER NOT NULL,
+        orders INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS product_pairs (
+        product_id INTEGER NOT NULL,
+        other_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (product_id, other_id)
+    )
+    """,
+]
+
+
+def create_recommendations_schema(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'product_sales'").fetchone()
+    with conn:
+        for statement in RECOMMENDATIONS_SCHEMA:
+            conn.execute(statement)
+        # La prima creare, statisticile se calculează din comenzile deja salvate
+        if not exists and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'order_items'").fetchone():
+            items = conn.execute("SELECT order_id, product_id, quantity FROM order_items ORDER BY order_id").fetchall()
+            orders = {}
+            for item in items:
+                orders.setdefault(item["order_id"], []).append((item["product_id"], item["quantity"]))
+            for lines in orders.values():
+                record_sales(conn, lines)
+
+
+# Actualizează incremental vânzările și perechile „cumpărate împreună”.
+# Se apelează în tranzacția care salvează comanda; lines = [(product_id, cantitate)].
+def record_sales(conn, lines: list):
+    conn.executemany(
+        "INSERT INTO product_sales (product_id, quantity, orders) VALUES (?, ?, 1) "
+        "ON CONFLICT(product_id) DO UPDATE SET quantity = quantity + excluded.quantity, orders = orders + 1",
+        lines,
+    )
+    product_ids = [product_id for product_id, _ in lines]
+    conn.executemany(
+        "INSERT INTO product_pairs (product_id, other_id, count) VALUES (?, ?, 1) "
+        "ON CONFLICT(product_id, other_id) DO UPDATE SET count = count + 1",
+        list(permutations(product_ids, 2)),
+    )
+
+
+def load_recommendations(conn, top_n: int, per_product: int):
+    top = [row["product_id"] for row in conn.execute(
+        "SELECT product_id FROM product_sales ORDER BY quantity DESC, product_id LIMIT ?", (top_n,)
+    )]
+    # Fără vânzări încă: primul produs din fiecare categorie
+    if not top:
+        top = [row["id"] for row in conn.execute(
+            "SELECT MIN(id) AS id FROM products GROUP BY category_id ORDER BY category_id"
+        )]
+    together = {}
+    for row in conn.execute(
+        """
+        SELECT product_id, other_id FROM (
+            SELECT product_id, other_id,
+                   ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY count DESC, other_id) AS rank
+            FROM product_pairs
+        ) WHERE rank <= ?
+        ORDER BY product_id, rank
+        """,
+        (per_product,),
+    ):
+        together.setdefault(row["product_id"], []).append(row["other_id"])
+    return top, together
+
+
+# Recomandări servite din memorie: cele mai vândute produse și, pentru fiecare produs,
+# cele cumpărate cel mai des împreună cu el. Listele sunt recalculate periodic
+# din tabelele actualizate la fiecare comandă.
+class Recommender:
+    def __init__(self, db, top_n: int = 10, per_product: int = 5):
+        self.db = db
+        self.top_n = top_n
+        self.per_product = per_product
+        self._top = []
+        self._suggestions = {}
+
+    async def refresh(self):
+        top, together = await self.db.run(load_recommendations, self.top_n, self.per_product)
+        suggestions = {}
+        for product_id, others in together.items():
+            merged = others + [p for p in top if p != product_id and p not in others]
+            suggestions[product_id] = merged[:self.per_product]
+        self._top = top
+        self._suggestions = suggestions
+
+    # Sugestii pentru un produs: mai întâi „cumpărate împreună”, apoi best-sellers
+    def suggest(self, product_id: int) -> list:
+        suggestions = self._suggestions.get(product_id)
+        if suggestions is None:
+            suggestions = [p for p in self._top if p != product_id]
+        return suggestions
+
+    def best_sellers(self) -> list:
+        return list(self._top)
+
+    async def refresh_periodically(self, interval: float):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Eroare la recalcularea recomandărilor: {e}")
+            await asyncio.sleep(interval)
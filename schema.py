@@ -0,0 +1,26 @@
+import logging
+
+from catalog import create_catalog_schema
+from orders import create_orders_schema
+from photos import create_photos_schema
+from recommendations import create_recommendations_schema
+
+logger = logging.getLogger(__name__)
+
+# Versiunea schemei din cosmetics.db (PRAGMA user_version). Se incrementează la orice
+# modificare a CATALOG_SCHEMA, ORDERS_SCHEMA, RECOMMENDATIONS_SCHEMA sau PHOTOS_SCHEMA.
+SCHEMA_VERSION = 3
+
+
+# Creează tabelele, indexurile și triggerele doar dacă baza de date nu are deja versiunea
+# curentă; la o repornire obișnuită costul este o singură citire de PRAGMA.
+def ensure_schema(conn) -> bool:
+    if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+        return False
+    create_catalog_schema(conn)
+    create_orders_schema(conn)
+    create_recommendations_schema(conn)
+    create_photos_schema(conn)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    logger.info(f"Schema bazei de date actualizată la versiunea {SCHEMA_VERSION}")
+    return True
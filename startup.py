@@ -0,0 +1,36 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Durata fazelor de pornire (import, construirea aplicației, inițializare) și timpul până la
+# primul update procesat, ca repornirile să poată fi urmărite în log și în metrici.
+class StartupTimer:
+    def __init__(self, started: float = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases = {}
+        self.first_update = None
+        self._last = self.started
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        return ", ".join(f"{phase} {duration:.2f}s" for phase, duration in self.phases.items())
+
+    # Callback pentru un TypeHandler(Update); după primul update costul e o singură comparație
+    async def record_first_update(self, update, context):
+        if self.first_update is None:
+            self.first_update = self.elapsed()
+            logger.info(f"Primul update procesat la {self.first_update:.2f}s de la pornire ({self.summary()})")
+
+    def stats(self) -> dict:
+        stats = {f"{phase}_seconds": round(duration, 3) for phase, duration in self.phases.items()}
+        stats["first_update_seconds"] = round(self.first_update, 3) if self.first_update is not None else None
+        return stats
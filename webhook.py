@@ -0,0 +1,156 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from http import HTTPStatus
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+# Server HTTP asincron minimal care primește update-urile Telegram prin webhook.
+# Update-urile intră în coada (limitată) a aplicației; când coada e plină răspundem
+# cu 503, iar Telegram retrimite update-ul mai târziu (backpressure).
+class WebhookServer:
+    def __init__(
+        self,
+        application,
+        path: str,
+        secret_token: str,
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        max_body_size: int = 1024 * 1024,
+    ):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.max_body_size = max_body_size
+        self.accepted = 0
+        self.rejected = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Webhook ascultă pe {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_update(self, headers: dict, body: bytes):
+        token = headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+            logger.warning("Webhook: secret token invalid")
+            return HTTPStatus.FORBIDDEN, b"", {}
+        try:
+            data = json.loads(body)
+            # de_json nu validează structura: null sau un câmp de tipul greșit ar ajunge în coadă
+            # ca None, respectiv ar arunca AttributeError
+            if not isinstance(data, dict):
+                raise ValueError("corpul cererii nu este un obiect JSON")
+            update = Update.de_json(data, self.application.bot)
+            if update is None:
+                raise ValueError("update gol")
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.error(f"Webhook: update invalid: {e}")
+            return HTTPStatus.BAD_REQUEST, b"", {}
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, b"", {"Retry-After": "1"}
+        self.accepted += 1
+        return HTTPStatus.OK, b"", {}
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _version = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0"))
+        if length > self.max_body_size:
+            raise ValueError("body prea mare")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError):
+                    await self._write_response(writer, HTTPStatus.BAD_REQUEST, b"", {}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                # Serverul e public: singura rută este cea a update-urilor
+                if method == "POST" and path == self.path:
+                    status, payload, extra_headers = await self._handle_update(headers, body)
+                else:
+                    status, payload, extra_headers = HTTPStatus.NOT_FOUND, b"", {}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, status, payload, extra_headers, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        except Exception as e:
+            logger.error(f"Webhook: eroare la procesarea cererii: {e}")
+        finally:
+            writer.close()
+
+    async def _write_response(self, writer, status, payload: bytes, extra_headers: dict, keep_alive: bool):
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Length: {len(payload)}"]
+        lines += [f"{name}: {value}" for name, value in extra_headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+
+
+# Pornește aplicația în mod webhook până la SIGINT/SIGTERM.
+# Fără webhook_url nu se apelează setWebhook (util pentru teste locale).
+async def run_webhook(application, server: WebhookServer, webhook_url: str = ""):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # Același ciclu de viață ca run_polling(), inclusiv hook-urile post_*
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.start()
+        await server.start()
+        if webhook_url:
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=server.secret_token,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        await stop.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)